@@ -108,6 +108,123 @@ action-updater -c rm:listkey:value""",
             default=False,
             action="store_true",
         )
+        command.add_argument(
+            "--snapshot",
+            dest="snapshot",
+            help="resolve action versions from a snapshot file (see snapshot export)",
+        )
+        command.add_argument(
+            "--offline",
+            dest="offline",
+            help="do not make any network requests (use with --snapshot)",
+            default=False,
+            action="store_true",
+        )
+        command.add_argument(
+            "--locked",
+            dest="locked",
+            help="check action versions against the lockfile, without network (see lock)",
+            default=False,
+            action="store_true",
+        )
+        command.add_argument(
+            "--lockfile",
+            dest="lockfile",
+            help="lockfile to use with --locked (defaults to .github/actions.lock)",
+        )
+
+    # Resolve action versions once, and write them to a lockfile
+    lock = subparsers.add_parser(
+        "lock",
+        description="resolve action versions and write them to a lockfile (actions.lock).",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    lock.add_argument(
+        "paths",
+        help="paths with actions to lock (e.g., .github/workflows)",
+        nargs="+",
+    )
+    lock.add_argument(
+        "--refresh",
+        dest="refresh",
+        help="resolve all versions again (by default only new references are resolved)",
+        default=False,
+        action="store_true",
+    )
+    lock.add_argument(
+        "-o",
+        "--lockfile",
+        dest="lockfile",
+        help="lockfile to write (defaults to actions.lock next to .github/workflows)",
+    )
+
+    # Export a snapshot of action tags for offline use
+    snapshot = subparsers.add_parser(
+        "snapshot",
+        description="export a snapshot of tags for actions, for offline use.",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    snapshot.add_argument("snapshot_command", help="snapshot command", choices=["export"])
+    snapshot.add_argument(
+        "paths",
+        help="paths with actions to resolve (e.g., yaml file or GitHub actions folder)",
+        nargs="+",
+    )
+    snapshot.add_argument(
+        "-o",
+        "--output",
+        dest="output",
+        help="snapshot file to write (defaults to action-updater-snapshot.json)",
+        default="action-updater-snapshot.json",
+    )
+
+    # Benchmark detect against a local mock GitHub API
+    benchmark = subparsers.add_parser(
+        "benchmark",
+        description="benchmark detect (version updater) against a local mock GitHub API.",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    for name, default, helpstr in [
+        ("files", 100, "number of workflow files to generate"),
+        ("steps", 5, "number of steps (uses) per workflow file"),
+        ("repos", 20, "number of unique action repositories"),
+        ("tags", 100, "number of release tags per repository"),
+        ("runs", 3, "number of detect runs"),
+    ]:
+        benchmark.add_argument(f"--{name}", dest=name, type=int, default=default, help=helpstr)
+    benchmark.add_argument(
+        "--latency",
+        dest="latency",
+        type=float,
+        default=0.05,
+        help="seconds of latency to add to each API request",
+    )
+    benchmark.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        help="repositories to resolve concurrently (defaults to settings)",
+    )
+    benchmark.add_argument(
+        "--page-workers",
+        dest="page_workers",
+        type=int,
+        help="pages of tags to fetch concurrently (defaults to settings)",
+    )
+    benchmark.add_argument(
+        "--cache",
+        dest="cache",
+        help="use the response cache (revalidated with ETags on each run)",
+        default=False,
+        action="store_true",
+    )
+    benchmark.add_argument(
+        "--keys",
+        dest="keys",
+        help="benchmark finding the latest tag (1k, 10k and 100k tags) instead of detect",
+        default=False,
+        action="store_true",
+    )
 
     config = subparsers.add_parser(
         "config",
@@ -192,6 +309,12 @@ def run_action_updater():
         from .config import main
     elif args.command == "update":
         from .update import main
+    elif args.command == "benchmark":
+        from .benchmark import main
+    elif args.command == "snapshot":
+        from .snapshot import main
+    elif args.command == "lock":
+        from .lock import main
     elif args.command == "list-updaters":
         from .listing import list_updaters as main
 
@@ -0,0 +1,29 @@
+__author__ = "Vanessa Sochat"
+__copyright__ = "Copyright 2022, Vanessa Sochat"
+__license__ = "MPL 2.0"
+
+from action_updater.logger import Table
+from action_updater.main.benchmark import run_benchmark, run_keys_benchmark
+
+
+def main(args, parser, extra, subparser):
+    if args.keys:
+        table = Table(run_keys_benchmark(runs=args.runs))
+        table.show(title="Version Keys Benchmark")
+        return
+
+    results = run_benchmark(
+        files=args.files,
+        steps=args.steps,
+        repos=args.repos,
+        tags=args.tags,
+        latency=args.latency,
+        runs=args.runs,
+        cache=args.cache,
+        workers=args.workers,
+        page_workers=args.page_workers,
+        settings_file=args.settings_file,
+        config_params=args.config_params,
+    )
+    table = Table(results)
+    table.show(title="Benchmark")
@@ -5,11 +5,17 @@ __license__ = "MPL 2.0"
 from action_updater.logger import logger
 from action_updater.main import get_client
 
-from .helpers import parse_updaters
+from .helpers import parse_lockfile, parse_updaters
 
 
 def main(args, parser, extra, subparser):
-    cli = get_client(quiet=args.quiet)
+    cli = get_client(
+        quiet=args.quiet,
+        settings_file=args.settings_file,
+        snapshot=args.snapshot,
+        offline=args.offline,
+        lockfile=parse_lockfile(args),
+    )
 
     # Update config settings on the fly
     cli.settings.update_params(args.config_params)
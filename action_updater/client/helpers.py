@@ -11,3 +11,14 @@ def parse_updaters(args):
     if args.updater_list:
         updaters += [x.strip() for x in args.updater_list.split(",") if x.strip()]
     return list(set(updaters))
+
+
+def parse_lockfile(args):
+    """
+    Get the lockfile to check against (with --locked), or None.
+    """
+    if not args.locked:
+        return
+    from action_updater.main.lock import get_lock_path
+
+    return args.lockfile or get_lock_path(args.paths)
@@ -0,0 +1,15 @@
+__author__ = "Vanessa Sochat"
+__copyright__ = "Copyright 2022, Vanessa Sochat"
+__license__ = "MPL 2.0"
+
+from action_updater.main import get_client
+
+
+def main(args, parser, extra, subparser):
+    cli = get_client(quiet=args.quiet, settings_file=args.settings_file)
+
+    # Update config settings on the fly
+    cli.settings.update_params(args.config_params)
+
+    if args.snapshot_command == "export":
+        cli.export_snapshot(paths=args.paths, filename=args.output)
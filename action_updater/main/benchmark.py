@@ -0,0 +1,190 @@
+__author__ = "Vanessa Sochat"
+__copyright__ = "Copyright 2022, Vanessa Sochat"
+__license__ = "MPL 2.0"
+
+import contextlib
+import io
+import math
+import os
+import random
+import shutil
+import time
+
+import action_updater.defaults as defaults
+import action_updater.utils as utils
+
+from .server import MockGitHubServer
+
+workflow_template = """name: benchmark-%s
+on:
+  push:
+    branches:
+      - main
+jobs:
+  build:
+    runs-on: ubuntu-latest
+    steps:
+%s
+"""
+
+
+def percentile(values, percent):
+    """
+    Get a percentile (nearest rank) from a list of values.
+    """
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[max(int(math.ceil(percent / 100 * len(values))) - 1, 0)]
+
+
+def generate_corpus(dirname, files=100, steps=5, repos=20, seed=0):
+    """
+    Write a corpus of workflow files, each using steps drawn from a pool of repos.
+    """
+    rand = random.Random(seed)
+    pool = [f"org{i % 5}/action{i}" for i in range(repos)]
+    for i in range(files):
+        uses = [f"      - uses: {rand.choice(pool)}@v1" for _ in range(steps)]
+        utils.write_file(
+            os.path.join(dirname, f"workflow-{i}.yaml"), workflow_template % (i, "\n".join(uses))
+        )
+    return dirname
+
+
+def get_benchmark_settings(
+    dirname, github_api, settings_file=None, cache=False, workers=None, page_workers=None
+):
+    """
+    Write a settings file that points to the mock server.
+    """
+    settings = utils.read_yaml(settings_file or defaults.default_settings_file)
+    settings["github_api"] = github_api
+    if workers:
+        settings["updaters"]["version"]["resolve_workers"] = workers
+    if page_workers:
+        settings["http"]["page_workers"] = page_workers
+
+    # The cache is always revalidated, to exercise ETags and 304s (stored versions would skip them)
+    settings["cache"]["directory"] = os.path.join(dirname, "cache") if cache else None
+    settings["cache"]["ttl"] = 0
+    settings["store"]["path"] = None
+    filename = os.path.join(dirname, "settings.yml")
+    utils.write_yaml(settings, filename)
+    return filename
+
+
+def run_benchmark(
+    files=100,
+    steps=5,
+    repos=20,
+    tags=100,
+    latency=0.05,
+    runs=3,
+    cache=False,
+    workers=None,
+    page_workers=None,
+    settings_file=None,
+    config_params=None,
+):
+    """
+    Run detect (version updater) over a generated corpus against a mock GitHub API.
+
+    Each run starts from a new client, so the cache (if enabled) is the only
+    state shared between runs. We return a result for each run.
+    """
+    from action_updater.main import get_client
+
+    tmpdir = utils.get_tmpdir(prefix="action-updater-benchmark")
+    corpus = generate_corpus(utils.get_tmpdir(tmpdir), files, steps, repos)
+    results = []
+
+    with MockGitHubServer(tag_count=tags, latency=latency) as server:
+        settings_file = get_benchmark_settings(
+            tmpdir, server.url, settings_file, cache, workers, page_workers
+        )
+        for run in range(runs):
+            client = get_client(quiet=True, settings_file=settings_file)
+            client.settings.update_params(config_params)
+
+            # Record the latency of every request
+            elapsed = []
+            client.session.hooks["response"].append(
+                lambda response, *args, **kwargs: elapsed.append(response.elapsed.total_seconds())
+            )
+
+            requests = server.requests
+            start = time.time()
+            with contextlib.redirect_stdout(io.StringIO()):
+                client.detect(corpus, details=False, updaters=["version"])
+            seconds = time.time() - start
+
+            results.append(
+                {
+                    "run": str(run + 1),
+                    "seconds": "%.3f" % seconds,
+                    "files/s": "%.1f" % (files / seconds),
+                    "requests": str(server.requests - requests),
+                    "p50 ms": "%.1f" % (percentile(elapsed, 50) * 1000),
+                    "p99 ms": "%.1f" % (percentile(elapsed, 99) * 1000),
+                }
+            )
+    shutil.rmtree(tmpdir)
+    return results
+
+
+def generate_tags(count, seed=0):
+    """
+    Generate unique tag names, mostly (v)major.minor.patch with majors, builds and nightlies.
+    """
+    rand = random.Random(seed)
+    tags = {}
+    while len(tags) < count:
+        kind = rand.random()
+        if kind < 0.7:
+            tag = "v%s.%s.%s" % (rand.randint(0, 30), rand.randint(0, 99), rand.randint(0, 999))
+        elif kind < 0.8:
+            tag = "%s.%s.%s.%s" % tuple(rand.randint(0, 99) for _ in range(4))
+        elif kind < 0.85:
+            tag = "v%s" % rand.randint(0, 30)
+        else:
+            tag = "nightly-%s" % rand.randint(1, 10**8)
+        tags[tag] = None
+    return list(tags)
+
+
+def run_keys_benchmark(sizes=(1000, 10000, 100000), runs=3):
+    """
+    Time finding the latest tag with the tags pipeline, one tag at a time, and in bulk.
+
+    We report the best of runs (in milliseconds) for each number of tags.
+    """
+    import action_updater.main.github as github
+    import action_updater.main.keys as keys
+
+    def best(func, tags):
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                func(tags)
+            times.append(time.perf_counter() - start)
+        return min(times) * 1000
+
+    results = []
+    for size in sizes:
+        tags = generate_tags(size)
+        pipeline = best(github.sort_tags, tags)
+        loop = best(github.latest_tag, tags)
+        bulk = best(keys.latest_tag, tags)
+        results.append(
+            {
+                "tags": str(size),
+                "pipeline ms": "%.1f" % pipeline,
+                "loop ms": "%.1f" % loop,
+                "bulk ms": "%.1f" % bulk,
+                "speedup": "%.1fx" % (pipeline / bulk),
+                "numpy": "yes" if keys.np is not None else "no",
+            }
+        )
+    return results
@@ -0,0 +1,329 @@
+__author__ = "Vanessa Sochat"
+__copyright__ = "Copyright 2022, Vanessa Sochat"
+__license__ = "MPL 2.0"
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import action_updater.utils as utils
+from action_updater.logger import logger
+
+
+class ResponseCache:
+    """
+    A persistent, on-disk cache of GitHub API responses.
+
+    Each entry is keyed by the API host and url (including parameters) and
+    stores the ETag and Last-Modified headers of the response. A fresh entry
+    (younger than the ttl) is returned without a request, and a stale entry
+    is revalidated with a conditional request. A 304 Not Modified response
+    does not count against the GitHub rate limit, so this is cheap.
+
+    The cache is bounded by entries and bytes on disk. We count both when the
+    cache is first written to, and then keep the counts as we write, so the
+    directory is only scanned again when we go over a bound.
+    """
+
+    def __init__(self, cache_dir, ttl=3600, max_entries=1000, max_bytes=None):
+        self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        self.ttl = ttl or 0
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+        # Entries and bytes on disk, None until counted
+        self.count = None
+        self.nbytes = None
+        utils.mkdir_p(self.cache_dir)
+
+    def __str__(self):
+        return "[action-updater-response-cache]"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def key(self, url, params=None):
+        """
+        Derive a cache key from the API host, url, and (sorted) parameters.
+        """
+        host = urlparse(url).netloc
+        params = "&".join("%s=%s" % (k, v) for k, v in sorted((params or {}).items()))
+        return hashlib.sha256(f"{host}|{url}|{params}".encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, url, params=None):
+        """
+        Get a cached entry for a url, or None if we don't have one.
+        """
+        path = self.path(self.key(url, params))
+        if not os.path.exists(path):
+            return
+        try:
+            return utils.read_json(path)
+        except (OSError, ValueError):
+            logger.debug(f"Cache entry {path} is not readable, ignoring.")
+
+    def is_fresh(self, entry):
+        """
+        A fresh entry can be used without revalidation.
+        """
+        return entry is not None and (time.time() - entry["updated"]) < self.ttl
+
+    def conditional_headers(self, entry):
+        """
+        Headers to revalidate a (stale) cached entry.
+        """
+        headers = {}
+        if not entry:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def set(self, url, params, response, data, last_page=None):
+        """
+        Save a response (and its validators) to the cache.
+        """
+        # Without validators or a ttl there is no way to use the entry
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified and not self.ttl:
+            return
+
+        entry = {
+            "url": url,
+            "params": params or {},
+            "etag": etag,
+            "last_modified": last_modified,
+            "updated": time.time(),
+            "last_page": last_page,
+            "data": data,
+        }
+        self.save(self.key(url, params), entry)
+        self.prune()
+
+    def touch(self, url, params, entry):
+        """
+        Mark an entry as fresh again after a 304 Not Modified.
+        """
+        entry["updated"] = time.time()
+        self.save(self.key(url, params), entry)
+
+    def save(self, key, entry):
+        """
+        Write an entry atomically so concurrent runs never see partial files.
+        """
+        path = self.path(key)
+        fd, tmpfile = tempfile.mkstemp(dir=self.cache_dir, prefix=key, suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(entry, fh)
+            size = fh.tell()
+        try:
+            previous = os.stat(path).st_size
+        except FileNotFoundError:
+            previous = None
+        os.replace(tmpfile, path)
+
+        with self.lock:
+            if self.count is not None:
+                self.count += previous is None
+                self.nbytes += size - (previous or 0)
+
+    def is_full(self):
+        with self.lock:
+            return (self.max_entries and self.count > self.max_entries) or (
+                self.max_bytes and self.nbytes > self.max_bytes
+            )
+
+    def prune(self):
+        """
+        Evict the least recently updated entries beyond max_entries (or max_bytes).
+
+        The directory is scanned once to count entries, and again only when
+        the counts we keep go over a bound (another process may also write).
+        """
+        if not self.max_entries and not self.max_bytes:
+            return
+        if self.count is not None and not self.is_full():
+            return
+
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+
+        count = len(entries)
+        nbytes = sum(x[1] for x in entries)
+        for _, size, path in entries:
+            if not (self.max_entries and count > self.max_entries) and not (
+                self.max_bytes and nbytes > self.max_bytes
+            ):
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            count -= 1
+            nbytes -= size
+        with self.lock:
+            self.count, self.nbytes = count, nbytes
+
+    def clear(self):
+        """
+        Remove all cached responses.
+        """
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".json"):
+                os.remove(entry.path)
+        with self.lock:
+            self.count, self.nbytes = 0, 0
+
+
+def get_size(value):
+    """
+    Estimate the memory used by a value (for values that do not report nbytes).
+    """
+    if hasattr(value, "nbytes"):
+        return value.nbytes
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(get_size(k) + get_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(get_size(x) for x in value)
+    return size
+
+
+class MemoryCache:
+    """
+    A thread-safe, in memory LRU cache, bounded by entries and (estimated) bytes.
+
+    Each entry expires after the ttl (if set). The least recently used entries
+    are evicted when there are more than max_entries, or they take more than
+    max_bytes. We count hits, misses, expired entries, and evictions.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.RLock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def __str__(self):
+        return "[action-updater-memory-cache]"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return self.lookup(key, count=False)[0]
+
+    def __getitem__(self, key):
+        found, value = self.lookup(key)
+        if not found:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def lookup(self, key, count=True):
+        """
+        Look up a key, returning (found, value). Expired entries are removed.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl and entry[2] + self.ttl < time.time():
+                self.discard(key)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += count
+                return False, None
+            self.entries.move_to_end(key)
+            self.hits += count
+            return True, entry[0]
+
+    def get(self, key, default=None):
+        found, value = self.lookup(key)
+        return value if found else default
+
+    def set(self, key, value):
+        """
+        Add (or replace) an entry, and evict the least recently used over the bounds.
+        """
+        size = get_size(value)
+        with self.lock:
+            self.discard(key)
+            self.entries[key] = (value, size, time.time())
+            self.nbytes += size
+            while len(self.entries) > 1 and (
+                (self.max_entries and len(self.entries) > self.max_entries)
+                or (self.max_bytes and self.nbytes > self.max_bytes)
+            ):
+                self.discard(next(iter(self.entries)))
+                self.evictions += 1
+
+    def update(self, values):
+        for key, value in values.items():
+            self.set(key, value)
+
+    def discard(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.nbytes -= entry[1]
+            return entry
+
+    def pop(self, key, default=None):
+        entry = self.discard(key)
+        return default if entry is None else entry[0]
+
+    def items(self):
+        """
+        Get a copy of (key, value) pairs, without counting hits.
+        """
+        with self.lock:
+            return [(key, entry[0]) for key, entry in self.entries.items()]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    @property
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.nbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
@@ -7,9 +7,13 @@ import os
 from rich.console import Console
 
 import action_updater.utils as utils
+from action_updater.logger import logger
 
 from .action import GitHubAction
+from .lock import Lockfile, get_lock_path
+from .session import get_session
 from .settings import Settings
+from .snapshot import Snapshot
 from .updater import UpdaterFinder
 
 
@@ -18,9 +22,20 @@ class ActionUpdater:
     Create a GitHub updater
     """
 
-    def __init__(self, quiet=False, token=None, settings_file=None, **kwargs):
+    def __init__(
+        self,
+        quiet=False,
+        token=None,
+        settings_file=None,
+        snapshot=None,
+        offline=False,
+        lockfile=None,
+        **kwargs,
+    ):
         self.token = token
         self._updaters = {}
+        self._session = None
+        self.offline = offline
         self.quiet = quiet
         self.c = Console()
 
@@ -31,6 +46,23 @@ class ActionUpdater:
         if not hasattr(self, "settings"):
             self.settings = Settings(settings_file)
 
+        # A snapshot of tags to resolve versions from (e.g., when offline)
+        self.snapshot = Snapshot(snapshot) if snapshot else None
+
+        # Checking against a lockfile never makes requests
+        self.lock = Lockfile(lockfile) if lockfile else None
+        if self.lock is not None:
+            self.offline = True
+
+    @property
+    def session(self):
+        """
+        A single pooled session, shared by all updaters
+        """
+        if self._session is None:
+            self._session = get_session(self.settings)
+        return self._session
+
     @property
     def updaters(self):
         """
@@ -44,7 +76,14 @@ class ActionUpdater:
             for name, updaterClass in self.finder.items():
 
                 # Instantiate an updater for the path, provide settings
-                self._updaters[name] = updaterClass(token=self.token, settings=self.settings)
+                self._updaters[name] = updaterClass(
+                    token=self.token,
+                    settings=self.settings,
+                    session=self.session,
+                    snapshot=self.snapshot,
+                    offline=self.offline,
+                    lock=self.lock,
+                )
 
         return self._updaters
 
@@ -68,25 +107,29 @@ class ActionUpdater:
                 final.add(filename)
         return list(final)
 
+    def iter_updaters(self, updaters=None):
+        """
+        Yield updaters, skipping those not selected by the user.
+        """
+        for _, updater in self.updaters.items():
+            if updaters and updater.slug not in updaters:
+                continue
+            yield updater
+
     def detect(self, paths, details=True, updaters=None):
         """
         Look for changes in files according to updaters
         """
-        actions = {}
+        # Load all actions first so updaters can resolve what they need up front
+        actions = {path: GitHubAction(path) for path in self.iter_paths(paths)}
+        for updater in self.iter_updaters(updaters):
+            updater.prepare(list(actions.values()))
 
-        for path in self.iter_paths(paths):
-
-            # Load into GitHub action
-            action = GitHubAction(path)
+        for path, action in actions.items():
 
             self.c.print(f"⭐️ [yellow]{path}[/yellow]")
 
-            # Todo convert this into an iter function (shared between detect and update)
-            for _, updater in self.updaters.items():
-
-                # Skip updaters per request of the user
-                if updaters and updater.slug not in updaters:
-                    continue
+            for updater in self.iter_updaters(updaters):
 
                 # The count reflects the last run
                 if updater.detect(action):
@@ -98,9 +141,56 @@ class ActionUpdater:
             # If we want to show details:
             if details:
                 action.diff(self.settings.code_theme or "vim")
-            actions[path] = action
         return actions
 
+    def export_snapshot(self, paths, filename):
+        """
+        Resolve tags for all actions referenced under paths, and save to a snapshot.
+        """
+        actions = [GitHubAction(path) for path in self.iter_paths(paths)]
+        updater = self.updaters["version"]
+        lookups = updater.get_tags_lookups(updater.get_repos(actions))
+        commits = updater.get_tag_commits(lookups)
+
+        snapshot = Snapshot(github_api=self.settings.github_api)
+        for repo, tags in lookups.items():
+            if tags:
+                snapshot.add(repo, tags, commits)
+        snapshot.save(filename)
+        self.c.print(
+            f"[purple]❇ Wrote snapshot of {len(snapshot)} repositories to {filename}[/purple]"
+        )
+        return snapshot
+
+    def write_lock(self, paths, filename=None, refresh=False):
+        """
+        Resolve versions for all actions under paths, and write them to a lockfile.
+
+        Without refresh, references already in the lockfile are kept, and only
+        new ones are resolved (with requests).
+        """
+        filename = filename or get_lock_path(paths)
+        actions = [GitHubAction(path) for path in self.iter_paths(paths)]
+        updater = self.updaters["version"]
+        uses = updater.get_uses(actions)
+
+        lock = Lockfile(github_api=self.settings.github_api)
+        if os.path.exists(filename) and not refresh:
+            lock = Lockfile(filename)
+        missing = {x: ref for x, ref in uses.items() if x not in lock}
+        updater.resolve({repo: ref for repo, ref in missing.values()})
+        for name, (repo, ref) in missing.items():
+            updated = updater.get_step_update(repo, ref, name)
+            if updated:
+                lock.add(name, repo, updated)
+            else:
+                logger.warning(f"Cannot resolve a version for {name}, not locked.")
+        lock.save(filename)
+        self.c.print(
+            f"[purple]❇ Wrote lockfile with {len(lock)} actions ({len(missing)} resolved) to {filename}[/purple]"
+        )
+        return lock
+
     def update(self, paths, details=True, updaters=None):
         """
         Update files.
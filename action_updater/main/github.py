@@ -3,21 +3,18 @@ __copyright__ = "Copyright 2022, Vanessa Sochat"
 __license__ = "MPL 2.0"
 
 
+import re
 import string
 
 import pipelib.pipeline as pipeline
 import pipelib.steps as step
 
+# all letters excluded except for v
+letters = "(%s)" % "|".join([x for x in string.ascii_letters if x not in ["v", "V"]])
 
-def sort_tags(tags):
-    """
-    Sort a list of string tags, return sorted (first latest) with original version
-    """
-    # all letters excluded except for v
-    letters = "(%s)" % "|".join([x for x in string.ascii_letters if x not in ["v", "V"]])
-
-    # A pipeline to process docker tags
-    steps = (
+# A pipeline to process docker tags (steps are not changed by a run, so we build it once)
+tags_pipeline = pipeline.Pipeline(
+    (
         # No letters except for "v"
         ~step.filters.HasPatterns(filters=[letters]),
         # Scrub commits from version string
@@ -25,15 +22,82 @@ def sort_tags(tags):
         # Parse versions, return sorted ascending, and taking version major.minor.patch into account
         step.container.ContainerTagSort(),
     )
-    p = pipeline.Pipeline(steps)
-    return p.run(list(tags), unwrap=False)
+)
+
+# A pipeline to process major tags (like v3)
+major_pipeline = pipeline.Pipeline(step.release.MajorTagSort())
+
+# The same letter filter, and version numbers, for fast version keys
+letters_regex = re.compile("[a-uw-zA-UW-Z]")
+numbers_regex = re.compile(r"\d+")
+semver_regex = re.compile(r"[vV]?(\d+)[.](\d+)[.](\d+)")
+
+
+def sort_tags(tags):
+    """
+    Sort a list of string tags, return sorted (first latest) with original version
+    """
+    return tags_pipeline.run(list(tags), unwrap=False)
 
 
 def sort_major(tags):
     """
     Allow major tags like v3
     """
-    # A pipeline to process docker tags
-    steps = step.release.MajorTagSort()
-    p = pipeline.Pipeline(steps)
-    return p.run(list(tags), unwrap=False)
+    return major_pipeline.run(list(tags), unwrap=False)
+
+
+def get_version_key(tag):
+    """
+    Get a sortable version key (a tuple of numbers) for a tag, like the tags pipeline.
+
+    Tags with letters (other than v) are skipped (None), a commit after "--"
+    is scrubbed (0.9.10--hdbcaa40_3 is 0.9.10.3), and we keep the numbers.
+    """
+    # Most tags are plain (v)major.minor.patch
+    match = semver_regex.fullmatch(tag)
+    if match:
+        return (int(match[1]), int(match[2]), int(match[3]))
+    if letters_regex.search(tag):
+        return
+    if "--" in tag and "_" in tag:
+        start, rest = tag.split("--", 1)
+        tag = "%s.%s" % (start, rest.split("_", 1)[-1])
+    return tuple(map(int, numbers_regex.findall(tag)))
+
+
+def get_major_key(tag):
+    """
+    Get the major version of a major tag (like v3), like the major pipeline, or None.
+    """
+    numbers = numbers_regex.findall(tag)
+    if len(numbers) == 1:
+        return int(numbers[0])
+
+
+def latest_tag(tags):
+    """
+    Get the latest major.minor.patch tag (the first of equal versions) in one pass.
+
+    This is the first tag that the tags pipeline (sort_tags) would return.
+    """
+    latest = None
+    latest_key = None
+    for tag in tags:
+        key = get_version_key(tag)
+        if key and len(key) >= 3 and (latest_key is None or key > latest_key):
+            latest, latest_key = tag, key
+    return latest
+
+
+def latest_major(tags):
+    """
+    Get the latest major tag (like v3) in one pass, the first that sort_major would return.
+    """
+    latest = None
+    latest_key = None
+    for tag in tags:
+        key = get_major_key(tag)
+        if key is not None and (latest_key is None or key > latest_key):
+            latest, latest_key = tag, key
+    return latest
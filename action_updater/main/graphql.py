@@ -0,0 +1,82 @@
+__author__ = "Vanessa Sochat"
+__copyright__ = "Copyright 2022, Vanessa Sochat"
+__license__ = "MPL 2.0"
+
+import json
+import re
+
+# A selection of tag refs for one repository (one page)
+tags_selection = """  %s: repository(owner: %s, name: %s) {
+    refs(refPrefix: "refs/tags/", first: 100%s) {
+      pageInfo { hasNextPage endCursor }
+      nodes { name target { oid __typename } }
+    }
+  }"""
+
+# The object an annotated tag (by sha) points to
+tag_object_selection = """  %s: repository(owner: %s, name: %s) {
+    object(oid: %s) { ... on Tag { target { oid __typename } } }
+  }"""
+
+
+def get_graphql_url(github_api):
+    """
+    Derive the GraphQL endpoint from the REST api root.
+
+    https://api.github.com -> https://api.github.com/graphql
+    https://github.example.com/api/v3 -> https://github.example.com/api/graphql
+    """
+    github_api = github_api.rstrip("/")
+    if re.search("/api/v3$", github_api):
+        return re.sub("/v3$", "/graphql", github_api)
+    return f"{github_api}/graphql"
+
+
+def get_tags_query(repos, cursors=None):
+    """
+    Get a query for the tags of many repositories, each under an alias.
+
+    Returns the query and a lookup of alias to repository.
+    """
+    cursors = cursors or {}
+    aliases = {}
+    selections = []
+    for i, repo in enumerate(repos):
+        owner, name = repo.split("/", 1)
+        alias = f"r{i}"
+        aliases[alias] = repo
+        after = ", after: %s" % json.dumps(cursors[repo]) if cursors.get(repo) else ""
+        selections.append(tags_selection % (alias, json.dumps(owner), json.dumps(name), after))
+    return "query {\n%s\n}" % "\n".join(selections), aliases
+
+
+def get_tag_objects_query(tags):
+    """
+    Get a query for the targets of annotated tag objects, a lookup of sha to repository.
+
+    Returns the query and a lookup of alias to tag sha.
+    """
+    aliases = {}
+    selections = []
+    for i, (sha, repo) in enumerate(tags.items()):
+        owner, name = repo.split("/", 1)
+        alias = f"t{i}"
+        aliases[alias] = sha
+        selections.append(
+            tag_object_selection % (alias, json.dumps(owner), json.dumps(name), json.dumps(sha))
+        )
+    return "query {\n%s\n}" % "\n".join(selections), aliases
+
+
+def parse_tags(refs):
+    """
+    Parse refs (nodes) into the same shape as the REST git/refs/tags listing.
+    """
+    tags = {}
+    for node in refs.get("nodes") or []:
+        target = node.get("target") or {}
+        tags[node["name"]] = {
+            "ref": f"refs/tags/{node['name']}",
+            "object": {"sha": target.get("oid"), "type": (target.get("__typename") or "").lower()},
+        }
+    return tags
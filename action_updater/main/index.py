@@ -0,0 +1,287 @@
+__author__ = "Vanessa Sochat"
+__copyright__ = "Copyright 2022, Vanessa Sochat"
+__license__ = "MPL 2.0"
+
+import bisect
+import enum
+import sys
+from collections.abc import Mapping
+
+from . import keys
+from .github import get_major_key, get_version_key
+
+
+class ObjectType(enum.IntEnum):
+    """
+    The type of object a tag points to: a commit, or a tag object (annotated tag).
+    """
+
+    commit = 0
+    tag = 1
+    tree = 2
+    blob = 3
+
+
+def pack_sha(sha):
+    """
+    Pack a hex sha into 20 raw bytes (anything that is not a sha is kept as is).
+    """
+    if isinstance(sha, str) and len(sha) == 40:
+        try:
+            return bytes.fromhex(sha)
+        except ValueError:
+            pass
+    return sha
+
+
+def unpack_sha(sha):
+    return sha.hex() if isinstance(sha, bytes) else sha
+
+
+class TagRecord:
+    """
+    What we keep for a tag: the sha (as bytes), the object type, and the order we saw it.
+    """
+
+    __slots__ = ("sha", "kind", "seq")
+
+    def __init__(self, sha, kind, seq):
+        self.sha = pack_sha(sha)
+        self.kind = ObjectType[kind or "commit"]
+        self.seq = seq
+
+    @property
+    def hexsha(self):
+        return unpack_sha(self.sha)
+
+    def to_list(self):
+        return [self.hexsha, self.kind.name, self.seq]
+
+
+class TagIndex(Mapping):
+    """
+    A lookup of tags for one repository, kept in version order.
+
+    The index acts like a tags lookup (tag name to a GitHub ref object), and
+    also keeps major.minor.patch tags and major tags (like v3) sorted by version
+    key, so the latest of each is known without a sort. Merging a new listing
+    only inserts (or removes) the tags that changed. Of equal versions, the
+    tag seen first wins, as with the version pipelines.
+
+    The sorted lists are built when first needed. If the latest tags are
+    already known (winners, as (latest, latest major)) they are used until
+    the index changes, so an index that is only read is never sorted.
+    """
+
+    def __init__(self, tags=None, winners=None):
+        # Tag name (interned) to a TagRecord, seq is the order we saw it
+        self.tags = {}
+
+        # Sorted (ascending) lists of (key, -seq, name), None until built
+        self.versions = None
+        self.majors = None
+        self.winners = winners
+
+        # Sha (commit or tag object) to tag names, None until needed
+        self.shas = None
+
+        # Version (major,) and (major, minor) to the latest tag within it, None until needed
+        self.ranges = None
+        self.seq = 0
+        for name, meta in (tags or {}).items():
+            obj = meta["object"]
+            self.tags[sys.intern(name)] = TagRecord(obj["sha"], obj.get("type"), self.next_seq())
+
+    def __getitem__(self, name):
+        record = self.tags[name]
+        return {
+            "ref": f"refs/tags/{name}",
+            "object": {"sha": record.hexsha, "type": record.kind.name},
+        }
+
+    def __iter__(self):
+        return iter(self.tags)
+
+    def __len__(self):
+        return len(self.tags)
+
+    def __contains__(self, name):
+        return name in self.tags
+
+    @property
+    def nbytes(self):
+        """
+        Estimated memory used by the index (a name, record and sorted entry for each tag).
+        """
+        size = sum(len(name) * 2 + 250 for name in self.tags)
+        if self.is_built:
+            size += 180 * (len(self.versions) + len(self.majors))
+        return size
+
+    def next_seq(self):
+        self.seq += 1
+        return self.seq
+
+    @property
+    def is_built(self):
+        return self.versions is not None
+
+    def build(self):
+        """
+        Sort the tags into versions and majors (once).
+
+        Large listings are parsed in bulk (with NumPy), others one tag at a time.
+        """
+        if self.is_built:
+            return
+        self.versions = []
+        self.majors = []
+        names = list(self.tags)
+        parsed = None
+        if keys.np is not None and len(names) >= keys.bulk_size:
+            bulk = keys.get_version_keys(names)
+            parsed = zip(keys.get_key_tuples(names, bulk), keys.get_major_keys(names, bulk))
+        for name in names:
+            entries, key = self.get_entries(name, next(parsed) if parsed else None)
+            if entries is not None:
+                entries.append((key, -self.tags[name].seq, name))
+        self.versions.sort()
+        self.majors.sort()
+
+    def get_entries(self, name, parsed=None):
+        """
+        Get the sorted entries (versions or majors) that a tag belongs to, and its key.
+
+        Parsed can be the (version, major) keys for the tag, if we already have them.
+        """
+        key, major = parsed or (get_version_key(name), None)
+        if key and len(key) >= 3:
+            return self.versions, key
+        if "." not in name:
+            key = major if parsed else get_major_key(name)
+            if key is not None:
+                return self.majors, key
+        return None, None
+
+    def get_names(self, sha):
+        """
+        Get the names of tags that point to a sha (a commit, or an annotated tag object).
+        """
+        if self.shas is None:
+            self.shas = {}
+            for name, record in self.tags.items():
+                self.shas.setdefault(record.sha, []).append(name)
+        return self.shas.get(pack_sha(sha), [])
+
+    def get_ranges(self):
+        """
+        Get the latest major.minor.patch tag within each major, and each major.minor.
+
+        Versions are sorted ascending, so the last tag we see for a range is its latest.
+        """
+        if self.ranges is None:
+            self.build()
+            self.ranges = {}
+            for key, _, name in self.versions:
+                self.ranges[key[:1]] = name
+                self.ranges[key[:2]] = name
+        return self.ranges
+
+    def latest_within(self, version):
+        """
+        Get the latest tag within a version range, like (1,) for v1 or (1, 2) for v1.2.
+        """
+        return self.get_ranges().get(tuple(version))
+
+    @property
+    def latest(self):
+        """
+        The latest major.minor.patch tag.
+        """
+        if self.winners is not None:
+            return self.winners[0]
+        self.build()
+        if self.versions:
+            return self.versions[-1][2]
+
+    @property
+    def latest_major(self):
+        """
+        The latest major tag (like v3).
+        """
+        if self.winners is not None:
+            return self.winners[1]
+        self.build()
+        if self.majors:
+            return self.majors[-1][2]
+
+    def add(self, name, meta):
+        """
+        Add (or update the commit of) a tag, inserting it in version order.
+        """
+        obj = meta["object"]
+        self.shas = None
+        if name in self.tags:
+            seq = self.tags[name].seq
+            self.tags[name] = TagRecord(obj["sha"], obj.get("type"), seq)
+            return
+        self.build()
+        self.winners = None
+        self.ranges = None
+        seq = self.next_seq()
+        self.tags[sys.intern(name)] = TagRecord(obj["sha"], obj.get("type"), seq)
+        entries, key = self.get_entries(name)
+        if entries is not None:
+            bisect.insort(entries, (key, -seq, name))
+
+    def remove(self, name):
+        """
+        Remove a tag (e.g., deleted from the repository).
+        """
+        self.build()
+        self.winners = None
+        self.shas = None
+        self.ranges = None
+        seq = self.tags.pop(name).seq
+        entries, key = self.get_entries(name)
+        if entries is None:
+            return
+        index = bisect.bisect_left(entries, (key, -seq, name))
+        if index < len(entries) and entries[index][2] == name:
+            del entries[index]
+
+    def merge(self, tags):
+        """
+        Merge a new listing of tags (a lookup by name), returning the number of changes.
+        """
+        removed = [name for name in self.tags if name not in tags]
+        for name in removed:
+            self.remove(name)
+        changed = len(removed)
+        for name, meta in tags.items():
+            if name not in self.tags or self.tags[name].sha != pack_sha(meta["object"]["sha"]):
+                self.add(name, meta)
+                changed += 1
+        return changed
+
+    def to_dict(self):
+        """
+        Save tags as {tag: [sha, type, seq]}, in index order (latest first) if sorted.
+        """
+        if not self.is_built:
+            return {name: record.to_list() for name, record in self.tags.items()}
+        names = [x[2] for x in reversed(self.versions)] + [x[2] for x in reversed(self.majors)]
+        seen = set(names)
+        names += [x for x in self.tags if x not in seen]
+        return {name: self.tags[name].to_list() for name in names}
+
+    @classmethod
+    def from_dict(cls, tags, winners=None):
+        """
+        Load an index saved with to_dict, with the latest tags (winners) if we know them.
+        """
+        index = cls(winners=winners)
+        for name, (sha, kind, seq) in tags.items():
+            index.tags[sys.intern(name)] = TagRecord(sha, kind, seq)
+            index.seq = max(index.seq, seq)
+        return index
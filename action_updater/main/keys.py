@@ -0,0 +1,254 @@
+__author__ = "Vanessa Sochat"
+__copyright__ = "Copyright 2022, Vanessa Sochat"
+__license__ = "MPL 2.0"
+
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from .github import get_major_key, get_version_key
+from .github import latest_major as latest_major_loop
+from .github import latest_tag as latest_tag_loop
+
+# NumPy is optional, without it we parse tags one at a time
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Below this many tags, parsing one at a time is as fast
+bulk_size = 1000
+
+# The first four numbers of a tag, and what we know about it
+fields = ["major", "minor", "patch", "build", "count", "letters", "dots", "scrub", "fallback"]
+VersionKey = namedtuple("VersionKey", fields)
+
+# Below this many tags (across repositories), a process pool is not worth starting
+pool_size = 20000
+
+# Numbers larger than this (in digits) don't fit in an int64
+max_digits = 18
+
+
+def get_version_keys(tags):
+    """
+    Parse the numbers of many tags at once into a structured array (or list of VersionKey).
+
+    For each tag we keep the first four numbers (build is -1 if there is no
+    fourth), how many numbers there are, and if it has letters (other than v),
+    dots, or a commit to scrub (-- and _). Tags we cannot parse as an array
+    (not ascii, or huge numbers) are flagged as fallback and parsed one at a time.
+    """
+    tags = list(tags)
+    if np is None:
+        return [get_fallback_key(tag) for tag in tags]
+
+    keys = np.zeros(
+        len(tags),
+        dtype=[(x, "i8") for x in fields[:4]] + [("count", "i4")] + [(x, "?") for x in fields[5:]],
+    )
+    if not tags:
+        return keys
+
+    # One buffer of bytes, tags separated (and ended) by a newline (not allowed in a tag)
+    chars = np.frombuffer(("\n".join(tags) + "\n").encode("utf-8"), dtype=np.uint8)
+    ends = np.flatnonzero(chars == 10)
+    row_starts = np.append(0, ends[:-1] + 1)
+
+    def any_rows(mask):
+        return np.logical_or.reduceat(mask, row_starts)
+
+    keys["letters"] = any_rows(
+        ((chars >= 97) & (chars <= 122) & (chars != 118))
+        | ((chars >= 65) & (chars <= 90) & (chars != 86))
+    )
+    keys["dots"] = any_rows(chars == 46)
+    dashes = chars == 45
+    dashes[:-1] &= dashes[1:]
+    keys["scrub"] = any_rows(dashes) & any_rows(chars == 95)
+    keys["fallback"] = any_rows(chars >= 128)
+
+    # Find the runs of digits, the row of each, and its number in the row
+    digits = (chars >= 48) & (chars <= 57)
+    edges = np.diff(digits.view(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    lengths = np.flatnonzero(edges == -1) - starts
+    rows = np.searchsorted(ends, starts)
+    first_run = np.searchsorted(starts, row_starts)
+    keys["count"] = np.diff(np.append(first_run, starts.size))
+    runs = np.arange(starts.size) - first_run[rows]
+
+    # Add up the digits of the first four runs of each row, a digit position at a time
+    keep = runs < 4
+    starts, lengths, rows, runs = starts[keep], lengths[keep], rows[keep], runs[keep]
+    keys["fallback"][rows[lengths > max_digits]] = True
+    values = np.zeros(starts.size, dtype=np.int64)
+    for position in range(min(int(lengths.max(initial=0)), max_digits)):
+        more = lengths > position
+        values[more] = values[more] * 10 + chars[starts[more] + position] - 48
+    numbers = np.zeros((len(tags), 4), dtype=np.int64)
+    numbers[rows, runs] = values
+
+    for i, name in enumerate(fields[:4]):
+        keys[name] = numbers[:, i]
+    keys["build"][keys["count"] < 4] = -1
+    return keys
+
+
+def get_fallback_key(tag):
+    """
+    Get a VersionKey for one tag (without NumPy).
+    """
+    key = get_version_key(tag)
+    numbers = list(key or ()) + [-1] * 4
+    return VersionKey(
+        *numbers[:4],
+        count=len(key or ()),
+        letters=key is None,
+        dots="." in tag,
+        scrub="--" in tag and "_" in tag,
+        fallback=True,
+    )
+
+
+def get_key_tuples(tags, keys=None):
+    """
+    Get version keys as tuples (like get_version_key) for many tags.
+
+    Keys that the array describes fully are built from its columns, others one at a time.
+    """
+    tags = list(tags)
+    if np is None:
+        return [get_version_key(tag) for tag in tags]
+
+    keys = keys if keys is not None else get_version_keys(tags)
+    exact = ~keys["letters"] & ~keys["scrub"] & ~keys["fallback"] & (keys["count"] <= 4)
+    columns = [keys[name].tolist() for name in fields[:5]]
+    tuples = []
+    for tag, is_exact, has_letters, major, minor, patch, build, count in zip(
+        tags, exact.tolist(), keys["letters"].tolist(), *columns
+    ):
+        if not is_exact:
+            tuples.append(None if has_letters else get_version_key(tag))
+        else:
+            tuples.append((major, minor, patch, build)[:count])
+    return tuples
+
+
+def get_major_keys(tags, keys=None):
+    """
+    Get major keys (like get_major_key) for many tags, None for tags that are not majors.
+    """
+    tags = list(tags)
+    if np is None:
+        return [get_major_key(tag) for tag in tags]
+
+    keys = keys if keys is not None else get_version_keys(tags)
+    majors = []
+    for tag, is_fallback, count, major in zip(
+        tags, keys["fallback"].tolist(), keys["count"].tolist(), keys["major"].tolist()
+    ):
+        if is_fallback:
+            majors.append(get_major_key(tag))
+        else:
+            majors.append(major if count == 1 else None)
+    return majors
+
+
+def get_first_max(candidates, keys, columns):
+    """
+    Narrow candidates (a mask) to those with the largest value in each column, in turn.
+    """
+    for column in columns:
+        if not candidates.any():
+            return candidates
+        values = keys[column]
+        candidates = candidates & (values == values[candidates].max())
+    return candidates
+
+
+def latest_tag(tags, keys=None):
+    """
+    Get the latest major.minor.patch tag with array operations (like github.latest_tag).
+    """
+    tags = list(tags)
+    if np is None or len(tags) < bulk_size:
+        return latest_tag_loop(tags)
+
+    keys = keys if keys is not None else get_version_keys(tags)
+    simple = ~keys["letters"] & ~keys["scrub"] & ~keys["fallback"]
+    candidates = get_first_max(simple & (keys["count"] >= 3), keys, fields[:4])
+
+    # Ties on four numbers (or tags we parse one at a time) are settled by their full key
+    indices = np.flatnonzero(candidates | (~keys["letters"] & ~simple)).tolist()
+    if not indices:
+        return
+    if len(indices) == 1:
+        return tags[indices[0]]
+    return latest_tag_loop(tags[i] for i in indices)
+
+
+def latest_major(tags, keys=None):
+    """
+    Get the latest major tag (like v3) with array operations (like github.latest_major).
+    """
+    tags = list(tags)
+    if np is None or len(tags) < bulk_size:
+        return latest_major_loop(tags)
+
+    keys = keys if keys is not None else get_version_keys(tags)
+    candidates = get_first_max(~keys["fallback"] & (keys["count"] == 1), keys, ["major"])
+    indices = np.flatnonzero(candidates | keys["fallback"]).tolist()
+    if not indices:
+        return
+    return latest_major_loop(tags[i] for i in indices)
+
+
+def get_winners(names):
+    """
+    Get the latest tag and latest major tag (without a dot) for a list of tag names.
+    """
+    return latest_tag(names), latest_major([x for x in names if "." not in x])
+
+
+def get_chunk_winners(chunk):
+    """
+    Get winners for a chunk of (repo, tag names), run in a worker process.
+    """
+    return [(repo, get_winners(names)) for repo, names in chunk]
+
+
+def get_chunks(listings, count):
+    """
+    Split listings ({repo: tag names}) into about count chunks with similar numbers of tags.
+    """
+    chunks = [[] for _ in range(count)]
+    sizes = [0] * count
+    for repo, names in sorted(listings.items(), key=lambda x: len(x[1]), reverse=True):
+        smallest = sizes.index(min(sizes))
+        chunks[smallest].append((repo, names))
+        sizes[smallest] += len(names)
+    return [x for x in chunks if x]
+
+
+def latest_tags(listings, workers=None):
+    """
+    Get winners (latest tag, latest major tag) for many repositories ({repo: tag names}).
+
+    Parsing tags is CPU bound (and holds the GIL), so large sets of listings are
+    sent to a process pool in chunks, and only the winning tags come back.
+    Workers defaults to the number of CPUs.
+    """
+    listings = {repo: list(names) for repo, names in listings.items()}
+    workers = workers or os.cpu_count() or 1
+    total = sum(len(x) for x in listings.values())
+    if workers == 1 or len(listings) < 2 or total < pool_size:
+        return {repo: get_winners(names) for repo, names in listings.items()}
+
+    # A few chunks per worker, to even out repositories of different sizes
+    chunks = get_chunks(listings, min(workers * 4, len(listings)))
+    winners = {}
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        for results in executor.map(get_chunk_winners, chunks):
+            winners.update(results)
+    return winners
@@ -0,0 +1,142 @@
+__author__ = "Vanessa Sochat"
+__copyright__ = "Copyright 2022, Vanessa Sochat"
+__license__ = "MPL 2.0"
+
+import json
+import os
+from datetime import datetime, timezone
+
+from action_updater.logger import logger
+
+# Bump if the lockfile format changes
+lock_version = 1
+
+# The lockfile is written next to .github/workflows
+lock_filename = "actions.lock"
+
+
+def get_lock_path(paths):
+    """
+    Get the default lockfile path for paths (a workflows folder or file).
+
+    For .github/workflows (or a file in it) this is .github/actions.lock.
+    """
+    path = os.path.abspath(paths[0] if isinstance(paths, list) else paths)
+    if os.path.isfile(path):
+        path = os.path.dirname(path)
+    if os.path.basename(path) == "workflows":
+        path = os.path.dirname(path)
+    return os.path.join(path, lock_filename)
+
+
+class Lockfile:
+    """
+    A lockfile of resolved action versions, to check workflows without network.
+
+    Each uses reference (e.g., actions/checkout@v3) maps to the repository, the
+    chosen tag, the commit it is pinned to (null for a major tag), and when it
+    was resolved. Entries are also indexed by repository and their commit and tag,
+    so a step that is already updated is found with a single dict access.
+    """
+
+    def __init__(self, filename=None, github_api=None):
+        self.filename = filename
+        self.github_api = github_api
+        self.created = None
+        self.actions = {}
+        self.repos = {}
+        if filename:
+            self.load(filename)
+
+    def __str__(self):
+        return "[action-updater-lockfile]"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __contains__(self, uses):
+        return uses in self.actions
+
+    def __len__(self):
+        return len(self.actions)
+
+    def load(self, filename):
+        """
+        Load a lockfile from file.
+        """
+        if not os.path.exists(filename):
+            logger.exit(f"Lockfile {filename} does not exist, create it with action-updater lock.")
+        with open(filename, "r") as fd:
+            data = json.load(fd)
+        if data.get("version") != lock_version:
+            logger.exit(
+                f"Lockfile {filename} has version {data.get('version')}, expected {lock_version}."
+            )
+        self.github_api = data.get("github_api")
+        self.created = data.get("created")
+        self.actions = {}
+        self.repos = {}
+        for uses, entry in (data.get("actions") or {}).items():
+            self.set(uses, entry)
+
+    def set(self, uses, entry):
+        """
+        Set the entry for a uses reference, and index it by repository (commit and tag).
+        """
+        self.actions[uses] = entry
+        refs = self.repos.setdefault(entry["repo"], {})
+        for ref in entry["commit"], entry["tag"]:
+            if ref:
+                refs[ref] = entry
+
+    def add(self, uses, repo, updated):
+        """
+        Add a resolved update (a major tag, or "<commit> # <tag>") for a uses reference.
+        """
+        commit = None
+        tag = updated
+        if "#" in updated:
+            commit, tag = [x.strip() for x in updated.split("#", 1)]
+        self.set(
+            uses,
+            {
+                "repo": repo,
+                "tag": tag,
+                "commit": commit,
+                "resolved": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S%z"),
+            },
+        )
+
+    def get_update(self, repo, uses=None, ref=None):
+        """
+        Get the locked update for a uses reference.
+
+        A step that is already updated (its ref is the commit or tag of an entry for
+        the repository) keeps that entry, and any other step is not in the lockfile.
+        The update is in the same shape the version updater resolves.
+        """
+        entry = self.actions.get(uses)
+        if not entry and ref:
+            entry = self.repos.get(repo, {}).get(ref)
+        if not entry:
+            return
+        if entry["commit"]:
+            return f"{entry['commit']} # {entry['tag']}"
+        return entry["tag"]
+
+    def save(self, filename=None):
+        """
+        Save the lockfile (sorted, so it diffs well).
+        """
+        filename = filename or self.filename
+        self.created = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S%z")
+        data = {
+            "version": lock_version,
+            "created": self.created,
+            "github_api": self.github_api,
+            "actions": self.actions,
+        }
+        with open(filename, "w") as fd:
+            json.dump(data, fd, indent=2, sort_keys=True)
+            fd.write("\n")
+        return filename
@@ -0,0 +1,66 @@
+__author__ = "Vanessa Sochat"
+__copyright__ = "Copyright 2022, Vanessa Sochat"
+__license__ = "MPL 2.0"
+
+import re
+from collections import namedtuple
+
+from action_updater.logger import logger
+
+# GitHub owner and repository names (an action can be in a subfolder of the repository)
+name_regex = re.compile(r"[A-Za-z0-9_.-]+")
+
+
+class Reference(namedtuple("Reference", ["owner", "repo", "subpath", "ref", "comment"])):
+    """
+    A parsed step uses reference, like github/codeql-action/init@v2 # a comment
+    """
+
+    __slots__ = ()
+
+    @property
+    def name(self):
+        """
+        The repository (owner/repo) that tags are resolved for.
+        """
+        return f"{self.owner}/{self.repo}"
+
+    @property
+    def path(self):
+        """
+        The action path (owner/repo, and the subpath if there is one), without the ref.
+        """
+        return "/".join(x for x in [self.owner, self.repo, self.subpath] if x)
+
+    def with_ref(self, ref):
+        """
+        Get the uses string for the same action at a different ref.
+        """
+        return f"{self.path}@{ref}"
+
+
+def parse_reference(uses):
+    """
+    Parse a step uses into a Reference, or None if it cannot be resolved.
+
+    Local actions (./), docker images (docker://), and expressions (${{ }}) are
+    skipped, as are references without a ref or an owner and repository.
+    """
+    if not isinstance(uses, str):
+        return
+    uses = uses.strip()
+    comment = None
+    if " #" in uses:
+        uses, comment = [x.strip() for x in uses.split(" #", 1)]
+
+    if uses.startswith(("./", "../", "docker://")) or "${{" in uses or "@" not in uses:
+        logger.debug(f"Skipping {uses}, it cannot be resolved to a repository.")
+        return
+
+    path, ref = uses.rsplit("@", 1)
+    parts = path.split("/", 2)
+    if not ref or len(parts) < 2 or not all(name_regex.fullmatch(x) for x in parts[:2]):
+        logger.debug(f"Skipping {uses}, it cannot be resolved to a repository.")
+        return
+    subpath = parts[2].strip("/") if len(parts) == 3 else None
+    return Reference(parts[0], parts[1], subpath or None, ref, comment)
@@ -159,12 +159,56 @@ updaters_schema = {
     },
 }
 
+# Persistent cache for GitHub API responses
+cache_schema = {
+    "type": "object",
+    "properties": {
+        "directory": {"type": ["string", "null"]},
+        "ttl": {"type": ["number", "null"]},
+        "max_entries": {"type": ["number", "null"]},
+        "max_bytes": {"type": ["number", "null"]},
+    },
+    "additionalProperties": False,
+}
+
+# Resolved versions shared between processes
+store_schema = {
+    "type": "object",
+    "properties": {
+        "path": {"type": ["string", "null"]},
+        "ttl": {"type": ["number", "null"]},
+    },
+    "additionalProperties": False,
+}
+
+# Requests to the GitHub API
+http_schema = {
+    "type": "object",
+    "properties": {
+        "page_workers": {"type": "number", "minimum": 1},
+        "pool_size": {"type": "number", "minimum": 1},
+        "keep_alive": {"type": "boolean"},
+        "retries": {"type": "number", "minimum": 0},
+        "backoff_factor": {"type": "number", "minimum": 0},
+        "backend": {"type": "string", "enum": ["rest", "graphql"]},
+        "graphql_batch_size": {"type": "number", "minimum": 1},
+        "rate_limit_reserve": {"type": "number", "minimum": 0},
+        "max_wait": {"type": "number", "minimum": 0},
+        "breaker_threshold": {"type": ["number", "null"]},
+        "breaker_cooldown": {"type": "number", "minimum": 0},
+    },
+    "additionalProperties": False,
+}
+
 # Currently all of these are required
 settingsProperties = {
     "github_api": {"type": "string"},
     "config_editor": {"type": "string"},
     "line_length": {"type": ["number", "null"]},
     "updaters": updaters_schema,
+    "cache": cache_schema,
+    "store": store_schema,
+    "http": http_schema,
     "code_theme": {"type": "string", "choices": list(get_all_styles())},
 }
 
@@ -0,0 +1,384 @@
+__author__ = "Vanessa Sochat"
+__copyright__ = "Copyright 2022, Vanessa Sochat"
+__license__ = "MPL 2.0"
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+
+def get_sha(*parts):
+    """
+    A deterministic (fake) commit sha for a synthetic repository.
+    """
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+# A repository selection (under an alias) in a GraphQL query from action_updater.main.graphql
+graphql_regex = re.compile(
+    r'(?P<alias>\w+): repository\(owner: (?P<owner>"[^"]*"), name: (?P<name>"[^"]*")\) \{\s*'
+    r'(refs\(refPrefix: "refs/tags/", first: (?P<first>\d+)(, after: (?P<after>"[^"]*"))?\)'
+    r'|object\(oid: (?P<oid>"[^"]*")\))'
+)
+
+
+def get_tag_names(count):
+    """
+    Generate count semantic version tags (e.g., v1.2.3) plus major tags (v1).
+    """
+    tags = []
+    majors = set()
+    for i in range(count):
+        major, minor, patch = i // 25 + 1, (i // 5) % 5, i % 5
+        tags.append(f"v{major}.{minor}.{patch}")
+        majors.add(major)
+    return tags + [f"v{major}" for major in sorted(majors)]
+
+
+class MockGitHubHandler(BaseHTTPRequestHandler):
+    """
+    Serve the subset of the GitHub API that updaters use.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def start_request(self):
+        """
+        Count a request (and its rate limit), returning False if we are out.
+        """
+        server = self.server
+        server.record_request()
+        if server.latency:
+            time.sleep(server.latency + random.uniform(0, server.jitter))
+
+        # Rate limit headers are always sent, and we fail when out
+        if server.take_rate_limit() < 0:
+            self.send_json(403, {"message": "API rate limit exceeded"})
+            return False
+        return True
+
+    def do_POST(self):
+        """
+        Answer GraphQL queries for tags (and annotated tag objects) of repositories.
+        """
+        if urlparse(self.path).path not in ["/graphql", "/api/graphql"]:
+            return self.send_json(404, {"message": "Not Found"})
+        if not self.start_request():
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        query = json.loads(self.rfile.read(length) or b"{}").get("query") or ""
+        if self.server.graphql_status != 200:
+            return self.send_json(self.server.graphql_status, {"message": "Server Error"})
+
+        data = {}
+        errors = []
+        for match in graphql_regex.finditer(query):
+            repo = "%s/%s" % (json.loads(match.group("owner")), json.loads(match.group("name")))
+            tags = self.server.get_tags(repo)
+            if tags is None:
+                data[match.group("alias")] = None
+                errors.append({"message": f"Could not resolve to a Repository {repo}."})
+            elif match.group("oid"):
+                data[match.group("alias")] = {
+                    "object": self.server.get_graphql_object(repo, json.loads(match.group("oid")))
+                }
+            else:
+                start = int(json.loads(match.group("after"))) if match.group("after") else 0
+                data[match.group("alias")] = {
+                    "refs": self.server.get_graphql_refs(tags, start, int(match.group("first")))
+                }
+        self.server.record_graphql()
+        result = {"data": data}
+        if errors:
+            result["errors"] = errors
+        self.send_json(200, result)
+
+    def do_GET(self):
+        server = self.server
+        if not self.start_request():
+            return
+
+        # GitHub Enterprise serves the API under /api/v3
+        url = urlparse(re.sub("^/api/v3/", "/", self.path))
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        # The latest release (only repositories in releases publish them)
+        match = re.match("^/repos/(?P<repo>[^/]+/[^/]+)/releases/latest$", url.path)
+        if match:
+            release = server.get_latest_release(match.group("repo"))
+            if release is None:
+                return self.send_json(404, {"message": "Not Found"})
+            return self.send_json(200, release)
+
+        # A single tag ref, by name
+        match = re.match("^/repos/(?P<repo>[^/]+/[^/]+)/git/ref/tags/(?P<name>.+)$", url.path)
+        if match:
+            ref = f"refs/tags/{match.group('name')}"
+            tags = [x for x in server.get_tags(match.group("repo")) or [] if x["ref"] == ref]
+            if not tags:
+                return self.send_json(404, {"message": "Not Found"})
+            return self.send_json(200, tags[0])
+
+        # Annotated tag objects point to a commit
+        match = re.match("^/repos/(?P<repo>[^/]+/[^/]+)/git/tags/(?P<sha>[0-9a-f]+)$", url.path)
+        if match:
+            tag = server.get_tag_object(match.group("repo"), match.group("sha"))
+            if tag is None:
+                return self.send_json(404, {"message": "Not Found"})
+            return self.send_json(200, tag)
+
+        # Tags can be listed, or matched by a prefix
+        match = re.match(
+            "^/repos/(?P<repo>[^/]+/[^/]+)/git/(refs/tags/?|matching-refs/tags/(?P<prefix>.*))$",
+            url.path,
+        )
+        if not match:
+            return self.send_json(404, {"message": "Not Found"})
+
+        repo = match.group("repo")
+        tags = server.get_tags(repo)
+        if tags is None:
+            return self.send_json(404, {"message": "Not Found"})
+        if match.group("prefix") is not None:
+            prefix = "refs/tags/" + match.group("prefix")
+            tags = [x for x in tags if x["ref"].startswith(prefix)]
+
+        per_page = int(params.get("per_page", 30))
+        page = int(params.get("page", 1))
+        last = max((len(tags) + per_page - 1) // per_page, 1)
+        data = tags[(page - 1) * per_page : page * per_page]
+        links = {}
+        if page < last:
+            links["next"] = page + 1
+            links["last"] = last
+        self.send_json(200, data, links=links, params=params)
+
+    def send_json(self, status, data, links=None, params=None):
+        """
+        Send a json response, with an ETag and a 304 if it matches.
+        """
+        body = json.dumps(data).encode("utf-8")
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+            self.server.refund_rate_limit()
+            if not self.server.links_on_304:
+                links = None
+
+        self.server.record_bytes(len(body))
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("X-RateLimit-Limit", str(self.server.rate_limit))
+        self.send_header("X-RateLimit-Remaining", str(max(self.server.remaining, 0)))
+        self.send_header("X-RateLimit-Reset", str(int(self.server.reset)))
+        if links:
+            base = f"http://{self.headers.get('Host')}{urlparse(self.path).path}"
+            self.send_header(
+                "Link",
+                ", ".join(
+                    '<%s?%s>; rel="%s"' % (base, urlencode(dict(params, page=page)), rel)
+                    for rel, page in links.items()
+                ),
+            )
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockGitHubServer(ThreadingHTTPServer):
+    """
+    A local stand-in for the GitHub API, serving synthetic repositories.
+
+    Every repository has tag_count tags unless given a count (or a list of
+    tag names) in repos (None for a repository that does not exist), and tags are annotated (pointing
+    to a tag object) for repositories in annotated. Repositories in releases publish
+    a release for their latest tag (or for the tag given, if releases is a lookup). We support pagination, latency
+    injection (seconds, with jitter), ETags, and rate limit headers. Point
+    the github_api setting at the server url (or url/api/v3, as for GitHub
+    Enterprise) to use it. Tag queries of the GraphQL backend are answered at /graphql
+    (or fail with graphql_status, if it is not 200). A 304 (not modified) sends
+    Link headers for pagination unless links_on_304 is False.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        port=0,
+        tag_count=100,
+        repos=None,
+        annotated=None,
+        releases=None,
+        latency=0,
+        jitter=0,
+        rate_limit=5000,
+        window=3600,
+        graphql_status=200,
+        links_on_304=True,
+    ):
+        super().__init__(("127.0.0.1", port), MockGitHubHandler)
+        self.tag_count = tag_count
+        self.repos = repos or {}
+        self.annotated = set(annotated or [])
+        self.releases = releases if isinstance(releases, dict) else dict.fromkeys(releases or [])
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.window = window
+        self.graphql_status = graphql_status
+        self.links_on_304 = links_on_304
+        self.remaining = rate_limit
+        self.reset = time.time() + window
+        self.requests = 0
+        self.graphql_requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self._tags = {}
+        self._thread = None
+
+    @property
+    def url(self):
+        return "http://%s:%s" % self.server_address
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def record_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def record_graphql(self):
+        with self.lock:
+            self.graphql_requests += 1
+
+    def record_bytes(self, count):
+        with self.lock:
+            self.bytes_sent += count
+
+    def take_rate_limit(self):
+        """
+        Use one request of the rate limit, resetting the window if it has passed.
+        """
+        with self.lock:
+            if time.time() > self.reset:
+                self.remaining = self.rate_limit
+                self.reset = time.time() + self.window
+            self.remaining -= 1
+            return self.remaining
+
+    def refund_rate_limit(self):
+        """
+        Conditional requests that return 304 do not count against the limit.
+        """
+        with self.lock:
+            self.remaining += 1
+
+    def get_tags(self, repo):
+        """
+        Get the git/refs/tags listing for a synthetic repository.
+        """
+        names = self.get_tag_names(repo)
+        if names is None:
+            return
+        if repo not in self._tags:
+            self._tags[repo] = [
+                {"ref": f"refs/tags/{name}", "object": self.get_tag_target(repo, name)}
+                for name in sorted(names)
+            ]
+        return self._tags[repo]
+
+    def add_tag(self, repo, name):
+        """
+        Add a tag to a repository (e.g., a new release), which changes its listing.
+        """
+        with self.lock:
+            self.repos[repo] = self.get_tag_names(repo) + [name]
+            self._tags.pop(repo, None)
+
+    def get_tag_names(self, repo):
+        """
+        Get the tag names of a repository, generated from its count unless given as a list.
+        """
+        count = self.repos.get(repo, self.tag_count)
+        if count is None or isinstance(count, list):
+            return count
+        return get_tag_names(count)
+
+    def get_latest_release(self, repo):
+        """
+        Get the latest release (for the latest major.minor.patch tag) of a repository.
+        """
+        names = [x for x in self.get_tag_names(repo) or [] if x.count(".") == 2]
+        if repo not in self.releases or not (names or self.releases[repo]):
+            return
+        name = self.releases[repo] or names[-1]
+        return {"tag_name": name, "name": name, "draft": False, "prerelease": False}
+
+    def get_tag_target(self, repo, name):
+        """
+        A tag ref points to a commit, or to a tag object if the tag is annotated.
+        """
+        if repo in self.annotated:
+            return {"sha": get_sha(repo, name, "tag"), "type": "tag"}
+        return {"sha": get_sha(repo, name), "type": "commit"}
+
+    def get_tag_object(self, repo, sha):
+        """
+        Get the git/tags object for an annotated tag (by sha) of a synthetic repository.
+        """
+        if repo not in self.annotated:
+            return
+        for tag in self.get_tags(repo) or []:
+            if tag["object"]["sha"] == sha:
+                name = tag["ref"].replace("refs/tags/", "", 1)
+                return {
+                    "sha": sha,
+                    "tag": name,
+                    "object": {"sha": get_sha(repo, name), "type": "commit"},
+                }
+
+    def get_graphql_refs(self, tags, start, first):
+        """
+        Get a page of tag refs (from a cursor, the index to start at) as GraphQL returns them.
+        """
+        nodes = [
+            {
+                "name": tag["ref"].replace("refs/tags/", "", 1),
+                "target": {
+                    "oid": tag["object"]["sha"],
+                    "__typename": tag["object"]["type"].title(),
+                },
+            }
+            for tag in tags[start : start + first]
+        ]
+        end = start + len(nodes)
+        return {"pageInfo": {"hasNextPage": end < len(tags), "endCursor": str(end)}, "nodes": nodes}
+
+    def get_graphql_object(self, repo, sha):
+        """
+        Get an object by sha as GraphQL returns it (a tag object has a target).
+        """
+        tag = self.get_tag_object(repo, sha)
+        if tag is None:
+            return
+        return {"target": {"oid": tag["object"]["sha"], "__typename": "Commit"}}
@@ -0,0 +1,226 @@
+__author__ = "Vanessa Sochat"
+__copyright__ = "Copyright 2022, Vanessa Sochat"
+__license__ = "MPL 2.0"
+
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from action_updater.logger import logger
+
+# Server errors that are worth trying again
+retry_statuses = [500, 502, 503, 504]
+
+
+class RequestScheduler:
+    """
+    Pace and retry requests to stay within GitHub rate limits.
+
+    We read X-RateLimit-Remaining, X-RateLimit-Reset, and Retry-After from
+    responses. When the remaining budget for a host reaches the reserve we
+    wait for the reset, and requests are spaced out as the budget gets low.
+    Server errors and secondary (abuse) rate limits are retried with jittered
+    exponential backoff, and a host that keeps failing has its circuit opened
+    for a cooldown, so a large scan gets slower instead of failing.
+    """
+
+    def __init__(
+        self,
+        retries=3,
+        backoff_factor=0.5,
+        reserve=10,
+        max_wait=900,
+        breaker_threshold=5,
+        breaker_cooldown=60,
+    ):
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.lock = threading.Lock()
+
+        # Lookups by host
+        self.remaining = {}
+        self.reset = {}
+        self.next_time = {}
+        self.failures = {}
+        self.open_until = {}
+
+    def request(self, send, method, url, **kwargs):
+        """
+        Send a request (send is the unscheduled request function) with pacing and retries.
+        """
+        host = urlparse(url).netloc
+        attempt = 0
+        while True:
+            self.wait(host)
+            response = send(method, url, **kwargs)
+            self.update(host, response)
+
+            delay = self.get_retry_delay(response, attempt)
+            if delay is None:
+                self.record(host, success=response.status_code < 500)
+                return response
+
+            self.record(host, success=False)
+            if attempt >= self.retries or delay > self.max_wait:
+                return response
+
+            attempt += 1
+            logger.debug(f"{response.status_code} for {url}, retry {attempt} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def wait(self, host):
+        """
+        Wait until we are allowed to send a request to a host.
+        """
+        with self.lock:
+            now = time.time()
+            start = max(now, self.next_time.get(host, 0), self.open_until.get(host, 0))
+
+            # Out of budget: wait for the reset. Low on budget: spread requests out.
+            remaining = self.remaining.get(host)
+            reset = self.reset.get(host, 0)
+            if remaining is not None and reset > start:
+                if remaining <= self.reserve:
+                    start = reset
+                elif remaining <= self.reserve * 10:
+                    start += (reset - start) / (remaining - self.reserve)
+
+            # Reserve this slot so concurrent requests queue behind it
+            if remaining is not None and start < reset:
+                self.remaining[host] = remaining - 1
+            self.next_time[host] = start
+
+        if start - now > 0:
+            if start - now > 5:
+                logger.warning(f"Waiting {start - now:.0f}s for API limits on {host}.")
+            time.sleep(min(start - now, self.max_wait))
+
+    def update(self, host, response):
+        """
+        Update rate limit state for a host from response headers.
+        """
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        with self.lock:
+            if remaining is not None and remaining.isdigit():
+                self.remaining[host] = int(remaining)
+            if reset is not None and reset.isdigit():
+                self.reset[host] = int(reset)
+
+    def get_retry_delay(self, response, attempt):
+        """
+        Get the seconds to wait before a retry, or None if we should not retry.
+        """
+        status = response.status_code
+        is_limited = status == 429 or (
+            status == 403
+            and (
+                "Retry-After" in response.headers
+                or response.headers.get("X-RateLimit-Remaining") == "0"
+                or "rate limit" in response.text.lower()
+            )
+        )
+        if not is_limited and status not in retry_statuses:
+            return
+
+        # Retry-After (secondary rate limits) or the reset time win
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return int(retry_after)
+        reset = response.headers.get("X-RateLimit-Reset", "")
+        if response.headers.get("X-RateLimit-Remaining") == "0" and reset.isdigit():
+            return max(int(reset) - time.time(), 0) + 1
+
+        # Otherwise, exponential backoff with full jitter
+        return random.uniform(0, self.backoff_factor * (2**attempt))
+
+    def record(self, host, success):
+        """
+        Record success or failure, opening the circuit for a host after too many failures.
+        """
+        with self.lock:
+            if success:
+                self.failures[host] = 0
+                return
+            self.failures[host] = self.failures.get(host, 0) + 1
+            if self.breaker_threshold and self.failures[host] >= self.breaker_threshold:
+                logger.warning(
+                    f"Too many failed requests to {host}, pausing for {self.breaker_cooldown}s."
+                )
+                self.open_until[host] = time.time() + self.breaker_cooldown
+                self.failures[host] = 0
+
+
+class GitHubSession(requests.Session):
+    """
+    A requests session that sends every request through a scheduler.
+    """
+
+    def __init__(self, scheduler=None):
+        super().__init__()
+        self.scheduler = scheduler or RequestScheduler()
+
+    def request(self, method, url, **kwargs):
+        return self.scheduler.request(super().request, method, url, **kwargs)
+
+
+def get_pool_size(settings=None):
+    """
+    Get a connection pool size that fits all requests we send at once.
+
+    Updaters resolve up to resolve_workers repositories concurrently, and each
+    fetches up to http:page_workers pages concurrently, so the pool holds
+    their product (at least http:pool_size). A smaller pool discards the
+    extra connections, and with them keep-alive.
+    """
+    cfg = (settings.get("http") if settings else None) or {}
+    updaters = (settings.get("updaters") if settings else None) or {}
+    workers = max([(x or {}).get("resolve_workers") or 1 for x in updaters.values()] + [1])
+    return max(cfg.get("pool_size") or 10, workers * (cfg.get("page_workers") or 1))
+
+
+def get_session(settings=None):
+    """
+    Get a pooled requests session for the GitHub API.
+
+    A single session is shared by all updaters, so connections (and TLS
+    handshakes) are reused across requests. The pool size, keep-alive, and
+    connection retries come from the http settings, and responses (rate
+    limits and server errors) are handled by the session scheduler.
+    """
+    cfg = (settings.get("http") if settings else None) or {}
+    pool_size = get_pool_size(settings)
+
+    retries = Retry(
+        total=cfg.get("retries") or 0,
+        backoff_factor=cfg.get("backoff_factor") or 0,
+        allowed_methods=None,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+
+    scheduler = RequestScheduler(
+        retries=cfg.get("retries") or 0,
+        backoff_factor=cfg.get("backoff_factor") or 0,
+        reserve=cfg.get("rate_limit_reserve") or 0,
+        max_wait=cfg.get("max_wait") or 900,
+        breaker_threshold=cfg.get("breaker_threshold"),
+        breaker_cooldown=cfg.get("breaker_cooldown") or 60,
+    )
+    session = GitHubSession(scheduler)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    # Connections are kept alive by default
+    if cfg.get("keep_alive") is False:
+        session.headers["Connection"] = "close"
+    return session
@@ -0,0 +1,101 @@
+__author__ = "Vanessa Sochat"
+__copyright__ = "Copyright 2022, Vanessa Sochat"
+__license__ = "MPL 2.0"
+
+import json
+import os
+from datetime import datetime, timezone
+
+from action_updater.logger import logger
+
+# Bump if the snapshot format changes
+snapshot_version = 1
+
+
+class Snapshot:
+    """
+    An offline snapshot of tags (and commits) for action repositories.
+
+    Tags are stored compactly as {repo: {tag: [sha, type]}} so a snapshot
+    can be loaded quickly and looked up by repository name without network.
+    Annotated tags that we resolved to a commit are stored with the commit,
+    so they can be pinned offline.
+    """
+
+    def __init__(self, filename=None, github_api=None):
+        self.filename = filename
+        self.github_api = github_api
+        self.created = None
+        self.repos = {}
+        if filename:
+            self.load(filename)
+
+    def __str__(self):
+        return "[action-updater-snapshot]"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __contains__(self, repo):
+        return repo in self.repos
+
+    def __len__(self):
+        return len(self.repos)
+
+    def load(self, filename):
+        """
+        Load a snapshot from file.
+        """
+        if not os.path.exists(filename):
+            logger.exit(f"Snapshot {filename} does not exist.")
+        with open(filename, "r") as fd:
+            data = json.load(fd)
+        if data.get("version") != snapshot_version:
+            logger.exit(
+                f"Snapshot {filename} has version {data.get('version')}, expected {snapshot_version}."
+            )
+        self.github_api = data.get("github_api")
+        self.created = data.get("created")
+        self.repos = data.get("repos") or {}
+
+    def add(self, repo, tags, commits=None):
+        """
+        Add a tags lookup (tag name to GitHub ref object) for a repository.
+
+        Commits is a lookup of annotated tag (object) sha to the commit it points to.
+        """
+        commits = commits or {}
+        self.repos[repo] = {}
+        for name, meta in tags.items():
+            sha, kind = meta["object"]["sha"], meta["object"].get("type", "commit")
+            if kind == "tag" and sha in commits:
+                sha, kind = commits[sha], "commit"
+            self.repos[repo][name] = [sha, kind]
+
+    def get_tags_lookup(self, repo):
+        """
+        Get a tags lookup for a repository, in the same shape as the GitHub API.
+        """
+        tags = self.repos.get(repo)
+        if tags is None:
+            return
+        return {
+            name: {"ref": f"refs/tags/{name}", "object": {"sha": sha, "type": kind}}
+            for name, (sha, kind) in tags.items()
+        }
+
+    def save(self, filename=None):
+        """
+        Save the snapshot to file.
+        """
+        filename = filename or self.filename
+        self.created = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S%z")
+        data = {
+            "version": snapshot_version,
+            "created": self.created,
+            "github_api": self.github_api,
+            "repos": self.repos,
+        }
+        with open(filename, "w") as fd:
+            json.dump(data, fd, separators=(",", ":"), sort_keys=True)
+        return filename
@@ -0,0 +1,154 @@
+__author__ = "Vanessa Sochat"
+__copyright__ = "Copyright 2022, Vanessa Sochat"
+__license__ = "MPL 2.0"
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import action_updater.utils as utils
+
+# Bump if the table format changes (the table is then rebuilt)
+store_version = 3
+
+
+class VersionStore:
+    """
+    A local SQLite store of resolved action versions, shared between processes.
+
+    Each row is keyed by the API host and repository (owner/repo) and holds the
+    tags index (latest first, as {tag: [sha, type, seq]}), the latest semantic version
+    tag, the latest major tag, when it was fetched, and a ttl. Annotated tag objects
+    are stored with the commit they point to, which never changes. The database uses
+    write-ahead logging, so concurrent runs can read while another one writes.
+    """
+
+    def __init__(self, filename, ttl=3600):
+        self.filename = os.path.abspath(os.path.expanduser(filename))
+        self.ttl = ttl or 0
+        self._local = threading.local()
+        utils.mkdir_p(os.path.dirname(self.filename))
+        self.init_db()
+
+    def __str__(self):
+        return "[action-updater-version-store]"
+
+    def __repr__(self):
+        return self.__str__()
+
+    @property
+    def db(self):
+        """
+        Get a connection for the current thread (sqlite connections are not shared).
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.filename, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout = 30000")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def init_db(self):
+        """
+        Create the versions table (in write-ahead logging mode) if it does not exist.
+        """
+        self.db.execute("PRAGMA journal_mode = WAL")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != store_version:
+            self.db.execute("DROP TABLE IF EXISTS versions")
+            self.db.execute("DROP TABLE IF EXISTS tag_commits")
+            self.db.execute(f"PRAGMA user_version = {store_version}")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS versions (
+                host TEXT NOT NULL,
+                repo TEXT NOT NULL,
+                tags TEXT,
+                latest TEXT,
+                major TEXT,
+                fetched REAL NOT NULL,
+                ttl REAL NOT NULL,
+                PRIMARY KEY (host, repo)
+            )
+            """)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS tag_commits (sha TEXT PRIMARY KEY, commit_sha TEXT NOT NULL)"
+        )
+
+    def get(self, host, repo, stale=False):
+        """
+        Get the stored versions for a repository, or None if missing or expired.
+
+        Tags are None if only the major tag was resolved (without listing tags).
+        """
+        row = self.db.execute(
+            "SELECT tags, latest, major, fetched, ttl FROM versions WHERE host = ? AND repo = ?",
+            (host, repo),
+        ).fetchone()
+        if not row:
+            return
+        tags, latest, major, fetched, ttl = row
+        if not stale and fetched + ttl < time.time():
+            return
+        return {
+            "tags": json.loads(tags) if tags is not None else None,
+            "latest": latest,
+            "major": major,
+            "fetched": fetched,
+            "ttl": ttl,
+        }
+
+    def set(self, host, repo, tags=None, latest=None, major=None, ttl=None):
+        """
+        Save (or replace) the versions for a repository.
+
+        Tags should be a saved tags index (TagIndex.to_dict).
+        """
+        self.db.execute(
+            "INSERT OR REPLACE INTO versions VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                host,
+                repo,
+                json.dumps(tags, separators=(",", ":")) if tags is not None else None,
+                latest,
+                major,
+                time.time(),
+                self.ttl if ttl is None else ttl,
+            ),
+        )
+
+    def get_commits(self, shas):
+        """
+        Get the commits for annotated tag objects (by sha) that we know.
+        """
+        shas = list(shas)
+        commits = {}
+        for start in range(0, len(shas), 500):
+            batch = shas[start : start + 500]
+            commits.update(
+                self.db.execute(
+                    "SELECT sha, commit_sha FROM tag_commits WHERE sha IN (%s)"
+                    % ",".join("?" * len(batch)),
+                    batch,
+                ).fetchall()
+            )
+        return commits
+
+    def set_commits(self, commits):
+        """
+        Save the commits for annotated tag objects, a lookup of tag sha to commit sha.
+        """
+        self.db.executemany("INSERT OR REPLACE INTO tag_commits VALUES (?, ?)", commits.items())
+
+    def prune(self):
+        """
+        Remove expired entries.
+        """
+        self.db.execute("DELETE FROM versions WHERE fetched + ttl < ?", (time.time(),))
+
+    def clear(self):
+        """
+        Remove all entries.
+        """
+        self.db.execute("DELETE FROM versions")
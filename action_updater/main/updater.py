@@ -9,15 +9,65 @@ import inspect
 import os
 import re
 from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
 
 import jsonschema
 import requests
 
+import action_updater.utils as utils
 from action_updater.logger import logger
 
+from . import graphql
+from .cache import ResponseCache
+from .session import get_session
+from .store import VersionStore
+
 here = os.path.abspath(os.path.dirname(__file__))
 
 
+def compact_ref(ref):
+    """
+    Keep only what we need from a GitHub ref: the name, and object sha and type.
+    """
+    obj = ref.get("object") or {}
+    return {"ref": ref.get("ref"), "object": {"sha": obj.get("sha"), "type": obj.get("type")}}
+
+
+def get_last_page(links):
+    """
+    Given parsed Link headers (response.links) get the last page number.
+    """
+    last = (links or {}).get("last", {}).get("url")
+    if not last:
+        return
+    page = parse_qs(urlparse(last).query).get("page")
+    if page and page[0].isdigit():
+        return int(page[0])
+
+
+def get_revalidated_last_page(response, entry, params):
+    """
+    Get the last page for a page of a listing that was not modified (a 304).
+
+    The page did not change, but pages after it can be new (a listing by name
+    grows at the end). The Link header of the 304 wins, and without one, a full
+    page that was the last we knew of means there may be a next page to ask for.
+    """
+    last_page = get_last_page(response.links)
+    if last_page:
+        return last_page
+    page = int((params or {}).get("page") or 1)
+    if "next" in (response.links or {}):
+        return page + 1
+    last_page = entry.get("last_page")
+    per_page = (params or {}).get("per_page")
+    is_full = per_page and isinstance(entry["data"], list) and len(entry["data"]) >= per_page
+    if is_full and (last_page or 1) <= page:
+        return page + 1
+    return last_page
+
+
 class UpdaterFinder(Mapping):
     """
     Create a cache of available updaters.
@@ -83,8 +133,10 @@ class UpdaterBase:
     # The default updater is not intended for static files
     static_files = False
 
-    def __init__(self, token, settings=None):
+    def __init__(self, token, settings=None, session=None, snapshot=None, offline=False, lock=None):
         self._data = {}
+        self._response_cache = None
+        self._version_store = None
         self.headers = {}
         self.update_token(token)
         self.count = 0
@@ -95,10 +147,28 @@ class UpdaterBase:
 
         self.validate_settings(settings)
 
+        # A pooled session is usually shared between updaters by the client
+        self.session = session or get_session(self.global_settings)
+
+        # A snapshot of tags can serve lookups, and offline we never make requests
+        self.snapshot = snapshot
+        self.offline = offline
+
+        # A lockfile of resolved versions to check against (without requests)
+        self.lock = lock
+
     @abc.abstractmethod
     def detect(self, *args, **kwargs):
         pass
 
+    def prepare(self, actions):
+        """
+        Given all actions to be checked, do any up-front work (e.g., requests).
+
+        This is called once before detect is run on each action.
+        """
+        pass
+
     @property
     def slug(self):
         return re.sub("(-|_)", "", self.name)
@@ -140,35 +210,339 @@ class UpdaterBase:
         """
         return self.get_request(f"{self.global_settings.github_api}/repos/{repo}/releases")
 
+    def get_latest_release(self, repo):
+        """
+        Get the latest release of a repository (not a draft or prerelease), or None.
+        """
+        data, _ = self.get_page(
+            f"{self.global_settings.github_api}/repos/{repo}/releases/latest", {}, missing_ok=True
+        )
+        return data
+
+    def get_tag_ref(self, repo, tag):
+        """
+        Get the ref (with object sha and type) for a single tag, or None.
+        """
+        data, _ = self.get_page(
+            f"{self.global_settings.github_api}/repos/{repo}/git/ref/tags/{tag}",
+            {},
+            missing_ok=True,
+        )
+        if isinstance(data, dict) and data.get("object"):
+            return compact_ref(data)
+
     def get_tags(self, repo):
         """
         Get the lateset tags for a repository
         """
-        return self.get_request(f"{self.global_settings.github_api}/repos/{repo}/git/refs/tags")
+        return self.get_request(
+            f"{self.global_settings.github_api}/repos/{repo}/git/refs/tags", reduce=compact_ref
+        )
 
     def get_tags_lookup(self, repo):
         """
         This isn't required to be sploot out, but it's easier to debug / read if necessary
         """
+        if self.snapshot is not None and repo in self.snapshot:
+            return self.snapshot.get_tags_lookup(repo)
+
         tags = {}
-        for t in self.get_tags(repo):
+        for t in self.get_tags(repo) or []:
             if "ref" not in t or "refs/tags" not in t["ref"]:
                 continue
             tags[re.sub("refs/tags/", "", t["ref"])] = t
         return tags
 
-    def get_request(self, url):
+    def get_matching_tags(self, repo, prefix):
         """
-        Perform a GitHub get request (assume pagination)
+        Get tags for a repository that start with a prefix (filtered by GitHub)
+        """
+        return self.get_request(
+            f"{self.global_settings.github_api}/repos/{repo}/git/matching-refs/tags/{prefix}",
+            reduce=compact_ref,
+        )
+
+    def get_matching_tags_lookup(self, repo, prefix):
+        """
+        Get a lookup of tags that start with a prefix.
+        """
+        if self.snapshot is not None and repo in self.snapshot:
+            tags = self.snapshot.get_tags_lookup(repo)
+            return {k: v for k, v in tags.items() if k.startswith(prefix)}
+
+        tags = {}
+        for t in self.get_matching_tags(repo, prefix) or []:
+            if "ref" not in t or "refs/tags" not in t["ref"]:
+                continue
+            tags[re.sub("refs/tags/", "", t["ref"])] = t
+        return tags
+
+    def get_tags_lookups(self, repos):
+        """
+        Get tag lookups for many repositories.
+
+        With the graphql backend (and a token) repositories are batched into
+        a few queries, otherwise we make one (paginated) REST request per repository.
+        """
+        repos = list(repos)
+        if (
+            self.http_settings.get("backend") != "graphql"
+            or not self.token
+            or self.offline
+            or self.snapshot is not None
+        ):
+            return {repo: self.get_tags_lookup(repo) for repo in repos}
+
+        batch_size = self.http_settings.get("graphql_batch_size") or 50
+        lookups = {}
+        for start in range(0, len(repos), batch_size):
+            lookups.update(self.get_graphql_tags(repos[start : start + batch_size]))
+        return lookups
+
+    def get_graphql_tags(self, repos):
+        """
+        Get tag lookups for a batch of repositories with aliased GraphQL queries.
+
+        Repositories with more pages of tags are queried again with their cursor.
+        If a query fails, its repositories are listed with REST instead.
+        """
+        lookups = {repo: {} for repo in repos}
+        cursors = {}
+        failed = []
+        while repos:
+            query, aliases = graphql.get_tags_query(repos, cursors)
+            data = self.post_graphql(query)
+            repos = []
+            for alias, repo in aliases.items():
+                if alias not in data:
+                    failed.append(repo)
+                    continue
+                refs = ((data.get(alias) or {}).get("refs")) or {}
+                lookups[repo].update(graphql.parse_tags(refs))
+                page = refs.get("pageInfo") or {}
+                if page.get("hasNextPage"):
+                    cursors[repo] = page["endCursor"]
+                    repos.append(repo)
+        for repo in failed:
+            lookups[repo] = self.get_tags_lookup(repo)
+        return lookups
+
+    def post_graphql(self, query):
         """
-        response = requests.get(url, headers=self.headers, params={"per_page": 100})
+        Perform a GitHub GraphQL query, returning the data.
 
+        If the query fails we warn and return no data, and callers use REST
+        for what they asked for. A large scan gets slower instead of failing.
+        """
+        url = graphql.get_graphql_url(self.global_settings.github_api)
         try:
+            response = self.session.post(url, headers=self.headers, json={"query": query})
             response.raise_for_status()
-        except Exception:
+            result = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"GraphQL request to {url} failed ({e}), using REST instead.")
+            return {}
+
+        for error in result.get("errors") or []:
+            logger.debug(error.get("message"))
+        return result.get("data") or {}
+
+    def get_tag_object(self, repo, sha):
+        """
+        Get an annotated tag object, which includes the object (usually a commit) it tags.
+        """
+        data, _ = self.get_page(
+            f"{self.global_settings.github_api}/repos/{repo}/git/tags/{sha}", {}
+        )
+        return data
+
+    def get_tag_targets(self, tags):
+        """
+        Get the targets of annotated tags (a lookup of tag sha to repository).
+
+        With the graphql backend (and a token) tags are batched into a few
+        queries, otherwise (or if a query fails) we make REST requests concurrently.
+        """
+        if (
+            self.http_settings.get("backend") != "graphql"
+            or not self.token
+            or self.offline
+            or self.snapshot is not None
+        ):
+            return self.get_tag_objects(tags)
+
+        targets = {}
+        failed = {}
+        batch_size = self.http_settings.get("graphql_batch_size") or 50
+        items = list(tags.items())
+        for start in range(0, len(items), batch_size):
+            query, aliases = graphql.get_tag_objects_query(dict(items[start : start + batch_size]))
+            data = self.post_graphql(query)
+            for alias, sha in aliases.items():
+                if alias not in data:
+                    failed[sha] = tags[sha]
+                    continue
+                target = (((data.get(alias) or {}).get("object")) or {}).get("target")
+                if target:
+                    targets[sha] = {"sha": target["oid"], "type": target["__typename"].lower()}
+        targets.update(self.get_tag_objects(failed))
+        return targets
+
+    def get_tag_objects(self, tags):
+        """
+        Get the targets of annotated tags with REST requests (made concurrently).
+        """
+        targets = {}
+        if not tags:
+            return targets
+        workers = self.http_settings.get("page_workers") or 1
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            objects = executor.map(self.get_tag_object, tags.values(), tags)
+            for sha, data in zip(tags, objects):
+                if data and data.get("object"):
+                    targets[sha] = data["object"]
+        return targets
+
+    def dereference_tags(self, tags):
+        """
+        Resolve annotated tags (a lookup of tag sha to repository) to commit shas.
+
+        A tag can point to another tag, so we follow targets until we reach a commit.
+        """
+        commits = {}
+        pending = {sha: (repo, sha) for sha, repo in tags.items()}
+        while pending:
+            targets = self.get_tag_targets({sha: repo for sha, (repo, _) in pending.items()})
+            following = {}
+            for sha, (repo, original) in pending.items():
+                target = targets.get(sha) or {}
+                if target.get("type") == "commit":
+                    commits[original] = target["sha"]
+                elif target.get("type") == "tag" and target["sha"] not in pending:
+                    following[target["sha"]] = (repo, original)
+            pending = following
+        return commits
+
+    @property
+    def http_settings(self):
+        """
+        Settings for requests to the GitHub API
+        """
+        return (self.global_settings.get("http") if self.global_settings else None) or {}
+
+    @property
+    def response_cache(self):
+        """
+        Get the persistent response cache, if enabled in settings.
+        """
+        if self._response_cache is not None:
+            return self._response_cache
+        cfg = (self.global_settings.get("cache") if self.global_settings else None) or {}
+        if not cfg.get("directory"):
+            return
+        self._response_cache = ResponseCache(
+            cfg["directory"],
+            ttl=cfg.get("ttl"),
+            max_entries=cfg.get("max_entries"),
+            max_bytes=cfg.get("max_bytes"),
+        )
+        return self._response_cache
+
+    @property
+    def version_store(self):
+        """
+        Get the store of resolved versions shared between processes, if enabled in settings.
+        """
+        if self._version_store is not None:
+            return self._version_store
+        cfg = (self.global_settings.get("store") if self.global_settings else None) or {}
+        if not cfg.get("path"):
+            return
+        self._version_store = VersionStore(cfg["path"], ttl=cfg.get("ttl"))
+        return self._version_store
+
+    def get_request(self, url, params=None, reduce=None):
+        """
+        Perform a GitHub get request (assume pagination)
+
+        The first page tells us (via the Link header) the last page, and the
+        remaining pages are then fetched concurrently (http:page_workers at a time).
+        All pages are fetched: tags are listed by name (and not by date), so
+        the newest tags can be on any page. If a page tells us of pages past
+        the last (e.g., a tag was added since we cached it), we fetch those too.
+        A reduce function streams a listing, keeping only its result for each item.
+        """
+        params = params or {"per_page": 100}
+        data, last_page = self.get_page(url, params, reduce)
+
+        # Not a listing, or only one page
+        if not isinstance(data, list) or not last_page or last_page <= 1:
+            return data
+
+        fetched = 1
+        workers = self.http_settings.get("page_workers") or 1
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while last_page > fetched:
+                results = executor.map(
+                    lambda page: self.get_page(url, dict(params, page=page), reduce),
+                    range(fetched + 1, last_page + 1),
+                )
+                fetched = last_page
+                for result, more in results:
+                    if isinstance(result, list):
+                        data += result
+                    last_page = max(last_page, more or 0)
+        return data
+
+    def get_page(self, url, params, reduce=None, missing_ok=False):
+        """
+        Get a single page, returning the data and the last page (if paginated)
+
+        If the response cache is enabled, a fresh entry is returned directly
+        and a stale one is revalidated with a conditional request. With a reduce
+        function, the listing is parsed incrementally from the response stream
+        and only the reduced items are kept (and cached). With missing_ok, a 404
+        is expected (e.g., a repository without releases) and not a warning.
+        """
+        cache = self.response_cache
+        entry = cache.get(url, params) if cache else None
+        if entry and (cache.is_fresh(entry) or self.offline):
+            return entry["data"], entry.get("last_page")
+
+        if self.offline:
+            logger.warning(f"Running offline, cannot request {url}.")
+            return None, None
+
+        headers = dict(self.headers)
+        if cache:
+            headers.update(cache.conditional_headers(entry))
+        response = self.session.get(url, headers=headers, params=params, stream=bool(reduce))
+
+        # Not modified - this does not count against our rate limit
+        if entry and response.status_code == 304:
+            entry["last_page"] = get_revalidated_last_page(response, entry, params)
+            cache.touch(url, params, entry)
+            return entry["data"], entry["last_page"]
+
+        # The session scheduler already retried rate limits and server errors
+        if not response.ok:
             # Set a warning about limtis without tokens!
-            if not self.token:
+            if not self.token and response.status_code in [403, 429]:
                 logger.exit("export GITHUB_TOKEN to increase API limits.")
+            if missing_ok and response.status_code == 404:
+                logger.debug(f"{url} was not found.")
+                return None, None
+            logger.warning(f"Request to {url} failed with {response.status_code}, skipping.")
+            return None, None
 
         # latest release should be first in this set
-        return response.json()
+        if reduce:
+            with response:
+                chunks = response.iter_content(chunk_size=65536)
+                data = [reduce(x) for x in utils.iter_json_array(chunks)]
+        else:
+            data = response.json()
+        last_page = get_last_page(response.links)
+        if cache:
+            cache.set(url, params, response, data, last_page)
+        return data, last_page
@@ -2,25 +2,514 @@ __author__ = "Vanessa Sochat"
 __copyright__ = "Copyright 2022, Vanessa Sochat"
 __license__ = "MPL 2.0"
 
-from action_updater.main.github import sort_major, sort_tags
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import action_updater.main.github as github
+import action_updater.main.keys as keys
+from action_updater.logger import logger
+from action_updater.main.cache import MemoryCache
+from action_updater.main.flight import SingleFlight
+from action_updater.main.index import TagIndex
+from action_updater.main.reference import parse_reference
 from action_updater.main.updater import UpdaterBase
 
 schema = {
     "type": "object",
     "properties": {
         # Allow these orgs to use major version strings
-        "major_orgs": {"type": "array", "items": {"type": "string"}}
+        "major_orgs": {"type": "array", "items": {"type": "string"}},
+        # Number of repositories to resolve concurrently before detect
+        "resolve_workers": {"type": "number", "minimum": 1},
+        # Number of processes to find the latest tags in (null uses all CPUs)
+        "sort_workers": {"type": ["number", "null"], "minimum": 1},
+        # Keep repositories (owner/repo) or orgs within their major (or major.minor) version
+        "constraints": {
+            "type": "object",
+            "additionalProperties": {"type": "string", "enum": ["major", "minor"]},
+        },
+        # Find the latest version from all tags, or the latest release first (and tags without)
+        "strategy": {"type": "string", "enum": ["tags", "releases"]},
+        # Bounds for tags kept in memory (null is unbounded), updates only use the ttl
+        "memory_cache": {
+            "type": "object",
+            "properties": {
+                "max_entries": {"type": ["number", "null"], "minimum": 1},
+                "max_bytes": {"type": ["number", "null"], "minimum": 1},
+                "ttl": {"type": ["number", "null"], "minimum": 0},
+            },
+            "additionalProperties": False,
+        },
     },
     "additionalProperties": False,
 }
 
+# A ref that is a full commit sha
+sha_regex = re.compile("[0-9a-f]{40}")
+
 
 class VersionUpdater(UpdaterBase):
 
     name = "version"
     description = "update action versions"
     schema = schema
-    cache = {"tags": {}}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pending_tags = {}
+
+        # Tags, updates, and commits of annotated tags for this client (not shared)
+        # Updates are small strings, and resolved by prepare for detect, so they are not bounded
+        bounds = self.settings.get("memory_cache") or {}
+        self.cache = {
+            "tags": MemoryCache(**bounds),
+            "updates": MemoryCache(ttl=bounds.get("ttl")),
+            "commits": MemoryCache(max_entries=bounds.get("max_entries")),
+            "releases": MemoryCache(**bounds),
+        }
+        self.flights = SingleFlight()
+
+        # Steps pinned to a commit sha (repo@sha) found by detect, and if latest, outdated or unknown
+        self.pins = {}
+
+    def parse_uses(self, uses):
+        """
+        Get the repository (owner/repo) and current ref for a step uses, or None if it cannot be updated.
+
+        Actions in a subfolder (like github/codeql-action/init) resolve the repository.
+        """
+        reference = parse_reference(uses)
+        if not reference:
+            return None, None
+        return reference.name, reference.ref
+
+    def get_uses(self, actions):
+        """
+        Get a lookup of unique uses references across actions, to (repository, ref).
+        """
+        uses = {}
+        for action in actions:
+            for step in action.steps:
+                if "uses" not in step or step["uses"] in uses:
+                    continue
+                repo, ref = self.parse_uses(step["uses"])
+                if repo:
+                    uses[step["uses"]] = (repo, ref)
+        return uses
+
+    def get_repos(self, actions):
+        """
+        Get a lookup of unique repositories (and a current ref) across actions.
+        """
+        repos = {}
+        for repo, ref in self.get_uses(actions).values():
+            if repo not in repos:
+                repos[repo] = ref
+        return repos
+
+    def prepare(self, actions):
+        """
+        Resolve updates for all unique repositories across actions, concurrently.
+
+        With a lockfile there is nothing to resolve, updates are looked up in it.
+        """
+        if self.lock is None:
+            self.resolve(self.get_repos(actions))
+            self.resolve_constrained(self.get_uses(actions).values())
+
+    def resolve(self, repos):
+        """
+        Resolve updates for repositories (a lookup of repository to current ref), concurrently.
+
+        Annotated tags selected along the way are resolved to commits together
+        at the end. After this, detect for each action only needs to look up the cache.
+        """
+        self.pending_tags = {}
+        repos = {repo: ref for repo, ref in repos.items() if repo not in self.cache["updates"]}
+
+        # Versions resolved recently (by any process) need no requests
+        for repo in list(repos):
+            if repo not in self.cache["tags"]:
+                updated = self.get_stored_update(repo, self.is_trusted(repo), defer=True)
+                if updated is not None:
+                    self.cache["updates"][repo] = updated
+                    del repos[repo]
+
+        # List tags for repositories that need them (all but trusted ones) up front
+        workers = self.settings.get("resolve_workers") or 1
+        missing = [x for x in repos if x not in self.cache["tags"]]
+        if self.uses_releases:
+            listings = {}
+        elif self.http_settings.get("backend") == "graphql":
+            listings = self.get_tags_lookups(missing)
+        else:
+            missing = [x for x in missing if not self.is_trusted(x)]
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                listings = dict(zip(missing, executor.map(self.get_tags_lookup, missing)))
+        listed = {}
+        for repo, tags in listings.items():
+            if tags is not None:
+                listed[repo] = self.get_tags_index(repo, tags, save=False)
+                self.cache["tags"][repo] = listed[repo]
+        self.sort_indexes(listed)
+
+        # Constrained repositories are resolved per step (see resolve_constrained)
+        repos = {repo: ref for repo, ref in repos.items() if not self.get_constraint(repo)}
+        if repos:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(
+                    executor.map(
+                        lambda repo: self.get_update(repo, repos[repo], True, listed.get(repo)),
+                        repos,
+                    )
+                )
+
+        # Dereference annotated tags in one batch, and then resolve those repositories again
+        if self.pending_tags:
+            self.resolve_tag_commits(self.pending_tags)
+            for repo in set(self.pending_tags.values()):
+                self.cache["updates"].pop(repo, None)
+                self.get_update(repo, tags=listed.get(repo))
+        self.pending_tags = {}
+        logger.debug(f"Tags in memory: {self.cache['tags'].stats}")
+
+    def sort_indexes(self, indexes):
+        """
+        Find the latest tags for new tags indexes (by repository) together, and save them.
+
+        This is CPU bound, so many (or large) listings are sent to a process pool.
+        Indexes merged into stored ones already know their latest tags.
+        """
+        indexes = {repo: x for repo, x in indexes.items() if isinstance(x, TagIndex)}
+        unsorted = {
+            repo: index
+            for repo, index in indexes.items()
+            if not index.is_built and index.winners is None
+        }
+        if unsorted:
+            winners = keys.latest_tags(unsorted, self.settings.get("sort_workers"))
+            for repo, index in unsorted.items():
+                index.winners = winners[repo]
+        for repo, index in indexes.items():
+            self.store_update(repo, index)
+
+    def get_update(self, repo, ref=None, defer=False, tags=None):
+        """
+        Get the updated version (major tag or tagged commit) for a repository.
+
+        The current ref (e.g., v3) lets us find the latest major tag for trusted
+        orgs without listing all tags. Versions resolved by any process are
+        shared in the version store (if enabled) until they expire. With defer,
+        an annotated tag that we need a commit for is left for prepare to resolve.
+        Tags (an index) that we just listed can be given, as the cache may have evicted them.
+        """
+        if self.lock is not None:
+            return self.get_locked_update(repo, ref)
+        found, updated = self.cache["updates"].lookup(repo)
+        if found:
+            return updated
+
+        # Concurrent lookups of the same repository wait for the first one
+        return self.flights.do(repo, self.resolve_update, repo, ref, defer, tags)
+
+    def get_step_update(self, repo, ref, uses=None):
+        """
+        Get the update for a step: the latest version, or the latest within its constraint.
+        """
+        if self.lock is not None:
+            return self.get_locked_update(repo, ref, uses)
+        constraint = self.get_constraint(repo)
+        if constraint:
+            return self.get_constrained_update(repo, ref, constraint)
+        return self.get_update(repo, ref)
+
+    def get_constraint(self, repo):
+        """
+        Get the constraint (major or minor) for a repository (or its org), if any.
+
+        Trusted orgs use major tags, so they are not constrained.
+        """
+        constraints = self.settings.get("constraints") or {}
+        constraint = constraints.get(repo) or constraints.get(repo.split("/", 1)[0])
+        if constraint and not self.is_trusted(repo):
+            return constraint
+
+    def resolve_constrained(self, uses):
+        """
+        Resolve updates for constrained steps (repository, ref) after their tags are listed.
+
+        Annotated tags are resolved to commits together, as for the latest versions.
+        """
+        self.pending_tags = {}
+        for repo, ref in uses:
+            constraint = self.get_constraint(repo)
+            if constraint:
+                self.get_constrained_update(repo, ref, constraint, defer=True)
+        if self.pending_tags:
+            self.resolve_tag_commits(self.pending_tags)
+        self.pending_tags = {}
+
+    def get_constrained_update(self, repo, ref, constraint, defer=False):
+        """
+        Get the latest tagged commit within the version of the current ref.
+
+        With the major constraint we stay within the current major version (e.g., v1),
+        and with minor within the current major.minor (e.g., v1.2). The tags index
+        knows the latest tag within each, so this is a lookup (and no sort).
+        """
+        key = f"{repo}@{ref}"
+        found, updated = self.cache["updates"].lookup(key)
+        if found:
+            return updated
+
+        tags = self.cache["tags"].get(repo)
+        if tags is None:
+            tags = self.get_tags_index(repo)
+            if tags is not None:
+                self.cache["tags"][repo] = tags
+        if not isinstance(tags, TagIndex):
+            return []
+
+        current = self.get_current_version(repo, tags, ref)
+        size = 1 if constraint == "major" else 2
+        if not current or len(current) < size:
+            logger.warning(f"Cannot find the {constraint} version of {key}, leaving it as is.")
+            self.cache["updates"][key] = []
+            return []
+
+        tag = tags.latest_within(current[:size])
+        updated = self.get_tagged_commit(tags, tag, repo=repo, defer=defer) if tag else []
+        if updated or not defer:
+            self.cache["updates"][key] = updated
+        return updated
+
+    def get_current_version(self, repo, tags, ref):
+        """
+        Get the version key of a ref, a tag (like v1.2.3) or a commit pinned to a tag.
+        """
+        names = [ref]
+        if sha_regex.fullmatch(ref or ""):
+            names = self.get_pinned_tags(repo, ref) or []
+        for name in names:
+            key = github.get_version_key(name)
+            if key:
+                return key
+
+    def get_locked_update(self, repo, ref=None, uses=None):
+        """
+        Get the update for a step from the lockfile, without requests.
+
+        A constrained step only uses the entry for its own uses reference, as the
+        entries of other steps for the repository can be in another version.
+        """
+        uses = uses or f"{repo}@{ref}"
+        if self.get_constraint(repo):
+            ref = None
+        updated = self.lock.get_update(repo, uses, ref)
+        if updated is None:
+            logger.warning(f"{uses} is not in the lockfile, run action-updater lock to add it.")
+        return updated
+
+    def resolve_update(self, repo, ref=None, defer=False, tags=None):
+        """
+        Resolve the update for a repository (called once for concurrent lookups).
+        """
+        found, updated = self.cache["updates"].lookup(repo)
+        if found:
+            return updated
+
+        is_trusted = self.is_trusted(repo)
+        if tags is None:
+            tags = self.cache["tags"].get(repo)
+
+        updated = None
+        if tags is None:
+            updated = self.get_stored_update(repo, is_trusted, defer)
+            if updated is not None:
+                self.cache["updates"][repo] = updated
+                return updated
+
+        if is_trusted:
+            if tags:
+                updated = self.get_major_tag(tags)
+            else:
+                updated = self.get_prefixed_major_tag(repo, ref)
+                if updated:
+                    self.store_update(repo, major=updated)
+
+        # The latest release (if the repository has releases) needs no listing
+        if (
+            not updated
+            and not is_trusted
+            and tags is None
+            and self.uses_releases
+            and not self.get_constraint(repo)
+        ):
+            release = self.get_release_tag(repo)
+            if release:
+                updated = self.get_tagged_commit(release, repo=repo, defer=defer)
+                self.cache["updates"][repo] = updated
+                return updated
+
+        # Retrieve all tags for the repository, an index by tag name
+        if not updated:
+            if tags is None:
+                tags = self.get_tags_index(repo)
+            if is_trusted:
+                updated = self.get_major_tag(tags)
+
+        if not updated:
+            updated = self.get_tagged_commit(tags, repo=repo, defer=defer)
+
+        # Save repo tags (if we listed them) and the update in cache
+        if tags is not None:
+            self.cache["tags"][repo] = tags
+        self.cache["updates"][repo] = updated
+        return updated
+
+    @property
+    def uses_releases(self):
+        """
+        Try the latest release before listing tags (not with a snapshot, or offline).
+        """
+        return (
+            self.settings.get("strategy") == "releases"
+            and self.snapshot is None
+            and not self.offline
+        )
+
+    def get_release_tag(self, repo):
+        """
+        Get the tag of the latest release of a repository, as a tags index of one.
+
+        We ask for the latest release and then for its tag ref (two small requests).
+        If there is no release (or tag) we return None, and the caller lists tags.
+        A release tag that is not a version (like nightly) is skipped in the same way.
+        """
+        found, index = self.cache["releases"].lookup(repo)
+        if found:
+            return index
+        release = self.get_latest_release(repo) or {}
+        name = release.get("tag_name")
+        if name and len(github.get_version_key(name) or ()) < 3:
+            logger.debug(f"The latest release of {repo} ({name}) is not a version, listing tags.")
+            name = None
+        meta = self.get_tag_ref(repo, name) if name else None
+        index = None
+        if meta:
+            index = TagIndex({name: meta}, (name, None))
+        self.cache["releases"][repo] = index
+        return index
+
+    def get_tags_index(self, repo, tags=None, save=True):
+        """
+        Get a tags index for a repository from a listing of tags (retrieved if not given).
+
+        If we have stored tags for the repository (even expired) only the tags
+        that changed since are merged in. With save, the index is saved to the version store.
+        """
+        if tags is None:
+            tags = self.get_tags_lookup(repo)
+        if not tags:
+            return tags
+
+        entry = None
+        if self.version_store and self.snapshot is None:
+            entry = self.version_store.get(self.store_host, repo, stale=True)
+        if entry and entry["tags"] is not None:
+            index = TagIndex.from_dict(entry["tags"], (entry["latest"], entry["major"]))
+            index.merge(tags)
+        else:
+            index = TagIndex(tags)
+        if save:
+            self.store_update(repo, index)
+        return index
+
+    def is_trusted(self, repo):
+        """
+        We will use major versions for these orgs (trusted)
+        """
+        trusted_orgs = self.settings.get("major_orgs")
+        org, _ = repo.split("/", 1)
+        return bool(trusted_orgs and org in trusted_orgs)
+
+    @property
+    def store_host(self):
+        return urlparse(self.global_settings.github_api).netloc
+
+    def get_stored_update(self, repo, is_trusted=False, defer=False):
+        """
+        Get an update from versions stored by this or another process, if we have them.
+        """
+        store = self.version_store
+        if not store or self.snapshot is not None:
+            return
+        entry = store.get(self.store_host, repo, stale=self.offline)
+        if not entry:
+            return
+        if is_trusted and entry["major"]:
+            return entry["major"]
+        if entry["tags"] is None:
+            return
+
+        # Keep the tags index in the cache (it acts like a tags lookup)
+        index = TagIndex.from_dict(entry["tags"], (entry["latest"], entry["major"]))
+        self.cache["tags"][repo] = index
+        return self.get_tagged_commit(index, repo=repo, defer=defer)
+
+    def store_update(self, repo, index=None, major=None):
+        """
+        Save resolved versions to the version store, for other runs to use.
+
+        If we have a tags index we save all of it (in version order), and
+        otherwise only the major tag that we found without listing tags.
+        """
+        store = self.version_store
+        if not store or self.snapshot is not None or self.offline:
+            return
+        if index is None:
+            return store.set(self.store_host, repo, major=major)
+        store.set(
+            self.store_host,
+            repo,
+            tags=index.to_dict(),
+            latest=index.latest,
+            major=index.latest_major,
+        )
+
+    def get_prefixed_major_tag(self, repo, ref=None):
+        """
+        Find the latest major tag (e.g., v4) by asking only for matching tags.
+
+        Starting from the major version of the current ref, we ask GitHub for tags
+        that start with it (v3 also matches v30-v39) and then for the next major,
+        until there are none. A major with release tags (like v4.0.0) but no
+        major tag does not stop us. A major without any tags does: with v3
+        and v5 but nothing for v4, we find v3 (only a listing of all tags would
+        find v5). If we find no major tag, we return None and the caller falls
+        back to listing all tags.
+        """
+        match = re.match("^(?P<prefix>[vV]?)(?P<major>[0-9]+)([.].*)?$", ref or "")
+        if not match:
+            return
+        prefix = match.group("prefix")
+        major_regex = re.compile("^%s(?P<major>[0-9]+)(?P<rest>[.].*)?$" % prefix)
+
+        latest = None
+        probe = int(match.group("major"))
+        while True:
+            tags = self.get_matching_tags_lookup(repo, f"{prefix}{probe}")
+            matches = [x for x in map(major_regex.match, tags) if x]
+            found = [int(x.group("major")) for x in matches if not x.group("rest")]
+            if found:
+                latest = max([latest or 0] + found)
+            if not matches:
+                break
+            probe = max(int(x.group("major")) for x in matches) + 1
+
+        if latest is not None:
+            return f"{prefix}{latest}"
 
     def detect(self, action):
         """
@@ -33,9 +522,6 @@ class VersionUpdater(UpdaterBase):
         if not action.steps:
             return False
 
-        # We will use major versions for these orgs (trusted)
-        trusted_orgs = self.settings.get("major_orgs")
-
         # For each job, look for steps->updater versions
         for step in action.steps:
 
@@ -43,34 +529,27 @@ class VersionUpdater(UpdaterBase):
             if "uses" not in step:
                 continue
 
-            repo = step["uses"]
-
-            # If we have a local action, nothing to update
-            if repo.startswith("./"):
+            reference = parse_reference(step["uses"])
+            if not reference:
                 continue
+            repo, ref = reference.name, reference.ref
 
-            # Get the current tag or version (we will want to maintain this convention)
-            # Create a lookup based on the ref
-            repo, _ = repo.split("@")
-            org, _ = repo.split("/", 1)
-
-            # Retrieve all tags for the repository, a lookup by tag name
-            tags = self.cache["tags"].get(repo) or self.get_tags_lookup(repo)
-
-            updated = None
-            if trusted_orgs and org in trusted_orgs:
-                updated = self.get_major_tag(tags)
-
-            if not updated:
-                updated = self.get_tagged_commit(tags)
-
-            # Save repo tags in cache
-            self.cache["tags"][repo] = tags
+            # Resolved up front by prepare, or retrieved now
+            updated = self.get_step_update(repo, ref, step["uses"])
 
             # If we don't have tags by this point, no go - we cannot parse
             if not updated:
                 continue
-            updated = f"{repo}@{updated}"
+
+            # Already pinned to the latest (commit or major tag), leave the step as is
+            if ref == updated.split("#", 1)[0].strip():
+                if sha_regex.fullmatch(ref):
+                    self.pins[f"{repo}@{ref}"] = "latest"
+                continue
+            if ref and sha_regex.fullmatch(ref):
+                self.check_pin(repo, ref, updated)
+
+            updated = reference.with_ref(updated)
             previous = step["uses"]
 
             # If we added a new comment, update the old one
@@ -94,10 +573,45 @@ class VersionUpdater(UpdaterBase):
 
         return self.count != 0
 
+    def check_pin(self, repo, sha, updated):
+        """
+        Report a step pinned to a commit sha that is not the latest, as outdated or unknown.
+        """
+        names = self.get_pinned_tags(repo, sha)
+        latest = updated.split("#", 1)[-1].strip()
+        if names is None:
+            return
+        if names:
+            self.pins[f"{repo}@{sha}"] = "outdated"
+            logger.info(f"{repo} is pinned to {', '.join(names)} ({sha[:7]}), latest is {latest}")
+        else:
+            self.pins[f"{repo}@{sha}"] = "unknown"
+            logger.warning(f"{repo} is pinned to {sha}, which is not a known tag commit.")
+
+    def get_pinned_tags(self, repo, sha):
+        """
+        Get the names of tags for a commit sha, from the tags index (without sorting).
+
+        An annotated tag points to a tag object, so we also look for tags whose
+        tag object we resolved to this commit. If we did not list tags, we return None.
+        """
+        tags = self.cache["tags"].get(repo)
+        if not isinstance(tags, TagIndex):
+            return
+        names = list(tags.get_names(sha))
+        for tag_sha, commit in list(self.cache["commits"].items()):
+            if commit == sha:
+                names += tags.get_names(tag_sha)
+        return names
+
     def get_major_tag(self, tags):
         """
         Given a list of repository tags, get the most up-todate!
         """
+        # The index knows its latest major tag
+        if isinstance(tags, TagIndex):
+            return tags.latest_major or []
+
         # If we have a major org, we trust it and want the major version tag
         tags_list = list(tags)
         tags_list = [x for x in tags_list if "." not in x]
@@ -106,34 +620,102 @@ class VersionUpdater(UpdaterBase):
         if not tags_list:
             return []
 
-        # Get ordered major tags
-        ordered = sort_major(tags_list)
+        # Get the latest major tag
+        tag = keys.latest_major(tags_list)
 
-        # If we don't have ordered, we could use branches, but skip for now
-        if not ordered:
+        # If we don't have one, we could use branches, but skip for now
+        if not tag:
             return []
 
-        tag = ordered[0]._original
-
         # Use latest release verbatim
         return tag
 
-    def get_tagged_commit(self, tags):
+    def get_latest_tag(self, tags):
         """
-        Given a list of repository tags, get the most up-todate!
+        Given a list of repository tags, get the latest (without sorting all of them).
         """
-        # Get ordered major tags
-        ordered = sort_tags(list(tags))
+        if isinstance(tags, TagIndex):
+            return tags.latest or tags.latest_major
 
         # First pass - no ordered tags, try to do the same for the major versions
-        if not ordered:
-            ordered = sort_major(tags)
+        return keys.latest_tag(tags) or keys.latest_major(tags)
+
+    def get_tagged_commit(self, tags, tag=None, repo=None, defer=False):
+        """
+        Given a list of repository tags, get the most up-todate!
+        """
+        tag = tag or self.get_latest_tag(tags)
 
-        # If we don't have ordered, we could use branches, but skip for now
-        if not ordered:
+        # If we don't have a tag, we could use branches, but skip for now
+        if not tag:
             return []
 
-        tag = ordered[0]._original
-        meta = tags[tag]
-        commit = meta["object"]["sha"]
+        commit = self.get_commit(repo, tags[tag], defer)
+        if not commit:
+            return []
         return f"{commit} # {tag}"
+
+    def get_commit(self, repo, meta, defer=False):
+        """
+        Get the commit for a tag. An annotated tag points to a tag object, not a commit.
+
+        With defer, an annotated tag we don't know yet is added to pending tags
+        (to resolve in a batch) and we return None.
+        """
+        obj = meta["object"]
+        if obj.get("type") != "tag":
+            return obj["sha"]
+
+        sha = obj["sha"]
+        commit = self.cache["commits"].get(sha)
+        if commit is None and self.version_store:
+            commit = self.version_store.get_commits([sha]).get(sha)
+            if commit:
+                self.cache["commits"][sha] = commit
+        if commit:
+            return commit
+        if defer:
+            self.pending_tags[sha] = repo
+            return
+
+        self.resolve_tag_commits({sha: repo})
+        commit = self.cache["commits"].get(sha)
+        if not commit:
+            logger.warning(f"Cannot find the commit for annotated tag {sha} of {repo}.")
+        return commit
+
+    def get_tag_commits(self, lookups):
+        """
+        Get commits for annotated tags that an update can select, for tags lookups by repository.
+
+        These are the latest tag, and the latest within each major and
+        major.minor version (for constraints). They are resolved together.
+        """
+        pending = {}
+        for repo, tags in lookups.items():
+            if not tags:
+                continue
+            index = TagIndex(tags)
+            for name in {index.latest, *index.get_ranges().values()} - {None}:
+                obj = tags[name]["object"]
+                if obj.get("type") == "tag":
+                    pending[obj["sha"]] = repo
+
+        if self.version_store:
+            self.cache["commits"].update(self.version_store.get_commits(pending))
+        missing = {sha: repo for sha, repo in pending.items() if sha not in self.cache["commits"]}
+        if missing:
+            self.resolve_tag_commits(missing)
+        commits = {sha: self.cache["commits"].get(sha) for sha in pending}
+        return {sha: commit for sha, commit in commits.items() if commit}
+
+    def resolve_tag_commits(self, tags):
+        """
+        Resolve annotated tags (a lookup of tag sha to repository) to commits.
+
+        Results are kept by tag sha, and never need to be invalidated.
+        """
+        commits = self.dereference_tags(tags)
+        self.cache["commits"].update(commits)
+        if commits and self.version_store:
+            self.version_store.set_commits(commits)
@@ -7,8 +7,8 @@
 # with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import os
-import shutil
 
+import action_updater.utils as utils
 from action_updater.main import get_client
 
 here = os.path.dirname(os.path.abspath(__file__))
@@ -19,9 +19,11 @@ def init_client(tmpdir):
     """
     Get a common client for some container technology and module system
     """
-    settings_file = os.path.join(root, "settings.yml")
+    settings = utils.read_yaml(os.path.join(root, "settings.yml"))
+    settings["cache"]["directory"] = os.path.join(tmpdir, "cache")
+    settings["store"]["path"] = os.path.join(tmpdir, "versions.db")
     new_settings = os.path.join(tmpdir, "settings.yml")
-    shutil.copyfile(settings_file, new_settings)
+    utils.write_yaml(settings, new_settings)
     client = get_client(
         quiet=False,
         settings_file=new_settings,
@@ -29,6 +31,42 @@ def init_client(tmpdir):
     return client
 
 
+def init_mock_client(tmpdir, server, cache=False, store=False, http=None, enterprise=False):
+    """
+    Get a client that uses a local mock GitHub API server
+
+    With enterprise, the API is under /api/v3 (as for GitHub Enterprise).
+    """
+    settings = utils.read_yaml(os.path.join(root, "settings.yml"))
+    settings["github_api"] = server.url + ("/api/v3" if enterprise else "")
+    settings["http"].update(http or {})
+    settings["cache"]["directory"] = os.path.join(tmpdir, "cache") if cache else None
+    settings["cache"]["ttl"] = 0
+    settings["store"]["path"] = os.path.join(tmpdir, "versions.db") if store else None
+    new_settings = os.path.join(tmpdir, "settings.yml")
+    utils.write_yaml(settings, new_settings)
+    return get_client(quiet=False, settings_file=new_settings)
+
+
+def write_workflow(tmpdir, uses, name="workflow.yaml"):
+    """
+    Write a workflow with one job, and a step for each uses (a list), returning the path.
+    """
+    workflow = os.path.join(tmpdir, name)
+    steps = "".join(f"      - uses: {x}\n" for x in uses)
+    with open(workflow, "w") as fd:
+        fd.write("on: push\njobs:\n  test:\n    runs-on: ubuntu-latest\n    steps:\n" + steps)
+    return workflow
+
+
+def detect_steps(client, workflow):
+    """
+    Run the version updater on a workflow, returning the (updated) steps.
+    """
+    action = client.detect(workflow, updaters=["version"])[workflow]
+    return list(action.steps)
+
+
 def get_updaters():
     client = get_client()
     return client.updaters
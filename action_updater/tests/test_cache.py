@@ -0,0 +1,95 @@
+#!/usr/bin/python
+
+# Copyright (C) 2022 Vanessa Sochat.
+
+# This Source Code Form is subject to the terms of the
+# Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+# with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from action_updater.main.cache import MemoryCache, ResponseCache
+
+
+def get_response(etag):
+    response = requests.Response()
+    response.status_code = 200
+    response.headers["ETag"] = etag
+    return response
+
+
+def test_response_cache(tmp_path):
+    """
+    Test saving, revalidation headers, and eviction of the response cache.
+    """
+    cache = ResponseCache(str(tmp_path), ttl=0, max_entries=2)
+    url = "https://api.github.com/repos/actions/checkout/git/refs/tags"
+    params = {"per_page": 100}
+    assert cache.get(url, params) is None
+
+    cache.set(url, params, get_response('"abc"'), [{"ref": "refs/tags/v3"}])
+    entry = cache.get(url, params)
+    assert entry["data"] == [{"ref": "refs/tags/v3"}]
+
+    # With a ttl of 0 we always revalidate with the ETag
+    assert not cache.is_fresh(entry)
+    assert cache.conditional_headers(entry) == {"If-None-Match": '"abc"'}
+
+    # Different hosts do not share entries
+    other = url.replace("api.github.com", "github.example.com/api/v3")
+    assert cache.key(url, params) != cache.key(other, params)
+
+    # Only the most recent max_entries are kept
+    for page in range(2, 5):
+        cache.set(url, {"page": page}, get_response(str(page)), [])
+    assert len(os.listdir(str(tmp_path))) == 2
+    assert cache.get(url, {"page": 4}) is not None
+
+    # Entries are also bounded by bytes on disk, counted as we write
+    cache = ResponseCache(str(tmp_path / "bytes"), ttl=0, max_entries=None, max_bytes=2500)
+    for page in range(1, 6):
+        cache.set(url, {"page": page}, get_response(str(page)), ["x" * 500])
+    sizes = [x.stat().st_size for x in os.scandir(cache.cache_dir)]
+    assert sum(sizes) <= 2500 and sum(sizes) == cache.nbytes
+    assert len(sizes) == cache.count == 3
+    assert cache.get(url, {"page": 5}) is not None and cache.get(url, {"page": 1}) is None
+
+
+def test_memory_cache():
+    """
+    Test eviction by entries and bytes, expiry, and statistics of the memory cache.
+    """
+    cache = MemoryCache(max_entries=2)
+    cache["a"] = 1
+    cache["b"] = 2
+    assert cache["a"] == 1
+    cache["c"] = 3
+
+    # b was least recently used
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.get("b") is None
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+    assert cache.stats["evictions"] == 1
+
+    cache = MemoryCache(max_bytes=1000)
+    cache["small"] = "x"
+    cache["large"] = "x" * 900
+    cache["larger"] = "x" * 900
+    assert list(dict(cache.items())) == ["larger"]
+    assert cache.stats["bytes"] <= 1000
+
+    cache = MemoryCache(ttl=0.05)
+    cache["a"] = 1
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.stats["expired"] == 1 and len(cache) == 0
+
+    # Concurrent writers stay within bounds
+    cache = MemoryCache(max_entries=50)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: cache.set(i % 100, i), range(2000)))
+    assert len(cache) == 50
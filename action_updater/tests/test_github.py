@@ -0,0 +1,137 @@
+#!/usr/bin/python
+
+# Copyright (C) 2022 Vanessa Sochat.
+
+# This Source Code Form is subject to the terms of the
+# Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+# with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import random
+
+import action_updater.main.github as github
+import action_updater.main.keys as keys
+from action_updater.main.index import ObjectType, TagIndex
+from action_updater.main.server import get_sha
+
+
+def get_tag(rand):
+    """
+    Get a random tag, in one of the many ways that repositories tag releases.
+    """
+    n = [str(rand.randint(0, 12)) for _ in range(4)]
+    return rand.choice(
+        [
+            "v%s.%s.%s" % tuple(n[:3]),
+            "%s.%s.%s" % tuple(n[:3]),
+            "V%s.%s.%s" % tuple(n[:3]),
+            "v%s" % n[0],
+            "V%s" % n[0],
+            n[0],
+            "v%s.%s" % tuple(n[:2]),
+            "v%s.%s.%s-rc%s" % tuple(n),
+            "%s.%s.%s--hdb%s_%s" % tuple(n + n[:1]),
+            "%s.%s.%s.%s" % tuple(n),
+            "v%s.%s.%s_%s" % tuple(n),
+            "%s-%s-%s" % tuple(n[:3]),
+            "v0%s.%s.%s" % tuple(n[:3]),
+            "vv%s.%s.%s+%s" % tuple(n),
+            "release-%s" % n[0],
+            "latest",
+        ]
+    )
+
+
+def test_fast_version_keys(capsys):
+    """
+    Test that fast version keys pick the same tags as the pipelib pipelines.
+    """
+    rand = random.Random(0)
+    for _ in range(500):
+        tags = list(dict.fromkeys(get_tag(rand) for _ in range(rand.randint(1, 80))))
+        ordered = [x._original for x in github.sort_tags(tags)]
+        major = [x._original for x in github.sort_major(tags)]
+        assert github.latest_tag(tags) == (ordered[0] if ordered else None)
+        assert github.latest_major(tags) == (major[0] if major else None)
+
+    # pipelib prints every version it parses
+    capsys.readouterr()
+
+
+def test_bulk_version_keys(monkeypatch):
+    """
+    Test that version keys parsed in bulk pick the same tags as one at a time.
+    """
+    monkeypatch.setattr(keys, "bulk_size", 0)
+    rand = random.Random(2)
+    extra = ["1.2.3.4.5", "v1.2.3.4.6", "9" * 25 + ".1.1", "\u00e91.2.3", "1.2.3--x_9", "v12", "12"]
+    for _ in range(300):
+        tags = [get_tag(rand) for _ in range(rand.randint(1, 60))]
+        tags = list(dict.fromkeys(tags + rand.sample(extra, rand.randint(0, 3))))
+        assert keys.latest_tag(tags) == github.latest_tag(tags)
+        assert keys.latest_major(tags) == github.latest_major(tags)
+        assert keys.get_key_tuples(tags) == [github.get_version_key(x) for x in tags]
+        assert keys.get_major_keys(tags) == [github.get_major_key(x) for x in tags]
+        assert TagIndex({x: {"object": {"sha": x}} for x in tags}).latest == github.latest_tag(tags)
+
+
+def test_latest_tags(monkeypatch):
+    """
+    Test that the latest tags found in a process pool match one repository at a time.
+    """
+    monkeypatch.setattr(keys, "pool_size", 0)
+    rand = random.Random(3)
+    listings = {
+        f"org/repo{i}": list(dict.fromkeys(get_tag(rand) for _ in range(rand.randint(1, 60))))
+        for i in range(20)
+    }
+    winners = keys.latest_tags(listings, workers=2)
+    assert winners == {repo: keys.get_winners(names) for repo, names in listings.items()}
+    for repo, (latest, major) in winners.items():
+        assert latest == github.latest_tag(listings[repo])
+        assert major == github.latest_major([x for x in listings[repo] if "." not in x])
+
+
+def test_tag_index():
+    """
+    Test that a tags index keeps the latest tags as tags are merged in (and removed).
+    """
+    rand = random.Random(1)
+    for _ in range(200):
+        names = list(dict.fromkeys(get_tag(rand) for _ in range(rand.randint(1, 60))))
+        index = TagIndex({name: {"object": {"sha": name, "type": "commit"}} for name in names})
+        assert index.latest == github.latest_tag(names)
+        assert index.latest_major == github.latest_major([x for x in names if "." not in x])
+
+        # Merge a listing with some tags deleted and some new
+        listing = [x for x in names if rand.random() > 0.2]
+        listing += [x for x in (get_tag(rand) for _ in range(10)) if x not in listing]
+        index.merge({name: {"object": {"sha": name, "type": "commit"}} for name in listing})
+        assert set(index) == set(listing)
+
+        # Of equal versions, the tag seen first wins
+        seen = [x for x in names if x in listing] + [x for x in listing if x not in names]
+        for saved in [index, TagIndex.from_dict(index.to_dict())]:
+            assert saved.latest == github.latest_tag(seen)
+            versions = [x for x in seen if len(github.get_version_key(x) or ()) >= 3]
+            for major in {github.get_version_key(x)[:1] for x in versions}:
+                within = [x for x in versions if github.get_version_key(x)[:1] == major]
+                assert saved.latest_within(major) == github.latest_tag(within)
+            assert saved.latest_major == github.latest_major([x for x in seen if "." not in x])
+
+
+def test_tag_records():
+    """
+    Test that tags are kept as compact records, and given back in the GitHub API shape.
+    """
+    tags = {
+        name: {"ref": f"refs/tags/{name}", "object": {"sha": get_sha(name), "type": kind}}
+        for name, kind in [("v1.0.0", "commit"), ("v1.0.1", "tag"), ("v1", "commit")]
+    }
+    index = TagIndex(tags)
+    record = index.tags["v1.0.1"]
+    assert not hasattr(record, "__dict__")
+    assert len(record.sha) == 20 and record.kind == ObjectType.tag
+    assert dict(index) == tags
+    assert dict(TagIndex.from_dict(index.to_dict())) == tags
+    assert index.get_names(get_sha("v1")) == ["v1"]
+    assert index.get_names("not-a-sha") == []
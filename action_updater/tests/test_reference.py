@@ -0,0 +1,46 @@
+#!/usr/bin/python
+
+# Copyright (C) 2022 Vanessa Sochat.
+
+# This Source Code Form is subject to the terms of the
+# Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+# with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import pytest
+
+from action_updater.main.reference import Reference, parse_reference
+
+
+@pytest.mark.parametrize(
+    "uses,expected",
+    [
+        ("actions/checkout@v3", Reference("actions", "checkout", None, "v3", None)),
+        (
+            "github/codeql-action/init@v2",
+            Reference("github", "codeql-action", "init", "v2", None),
+        ),
+        (
+            "org/repo/path/to/action@abc # v1.2.3",
+            Reference("org", "repo", "path/to/action", "abc", "v1.2.3"),
+        ),
+        ("./.github/actions/local", None),
+        ("docker://alpine:3.8", None),
+        ("docker://ghcr.io/org/image@sha256:abc", None),
+        ("${{ matrix.action }}", None),
+        ("org/${{ matrix.repo }}@v1", None),
+        ("org/repo", None),
+        ("org/repo@", None),
+        ("repo@v1", None),
+    ],
+)
+def test_parse_reference(uses, expected):
+    """
+    Test parsing step uses into owner, repo, subpath, ref and comment.
+    """
+    assert parse_reference(uses) == expected
+
+
+def test_reference_paths():
+    reference = parse_reference("github/codeql-action/analyze@v2")
+    assert reference.name == "github/codeql-action"
+    assert reference.with_ref("v3") == "github/codeql-action/analyze@v3"
@@ -0,0 +1,138 @@
+#!/usr/bin/python
+
+# Copyright (C) 2022 Vanessa Sochat.
+
+# This Source Code Form is subject to the terms of the
+# Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+# with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import time
+
+import pytest
+import requests
+
+import action_updater.main.session as session
+from action_updater.main.server import MockGitHubServer
+from action_updater.main.session import GitHubSession, RequestScheduler, get_pool_size, get_session
+
+url = "https://api.github.com/repos/actions/checkout/git/refs/tags"
+
+
+def get_response(status=200, **headers):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    response._content = b"{}"
+    return response
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """
+    Record the seconds the scheduler waits, instead of waiting.
+    """
+    waits = []
+    monkeypatch.setattr(session.time, "sleep", waits.append)
+    return waits
+
+
+def send_responses(responses):
+    """
+    Get a send function that gives back responses in turn (and counts calls).
+    """
+    responses = list(responses)
+
+    def send(method, url, **kwargs):
+        send.calls += 1
+        return responses.pop(0)
+
+    send.calls = 0
+    return send
+
+
+def test_pool_size():
+    """
+    Test that the connection pool fits all concurrent requests of resolve and page workers.
+    """
+    settings = {
+        "http": {"pool_size": 10, "page_workers": 4},
+        "updaters": {"version": {"resolve_workers": 8}},
+    }
+    assert get_pool_size(settings) == 32
+    adapter = get_session(settings).get_adapter("https://api.github.com")
+    assert adapter.poolmanager.connection_pool_kw["maxsize"] == 32
+
+    # The pool is never smaller than pool_size
+    settings["updaters"]["version"]["resolve_workers"] = 1
+    assert get_pool_size(settings) == 10
+    assert get_pool_size(None) == 10
+
+
+def test_scheduler_retries(sleeps):
+    """
+    Test that rate limited requests honor Retry-After (or the reset), and server errors back off.
+    """
+    scheduler = RequestScheduler(retries=3, backoff_factor=1)
+    send = send_responses([get_response(403, **{"Retry-After": "7"}), get_response(200)])
+    assert scheduler.request(send, "GET", url).status_code == 200
+    assert send.calls == 2 and sleeps == [7]
+
+    # Out of requests, we wait for the reset (plus a second)
+    reset = str(int(time.time()) + 30)
+    limited = get_response(403, **{"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset})
+    sleeps.clear()
+    scheduler = RequestScheduler(retries=3, backoff_factor=1, reserve=0)
+    scheduler.request(send_responses([limited, get_response(200)]), "GET", url)
+    assert 29 <= sleeps[0] <= 31
+
+    # Server errors are retried with jittered exponential backoff, and then returned
+    sleeps.clear()
+    scheduler = RequestScheduler(retries=2, backoff_factor=1, breaker_threshold=None)
+    send = send_responses([get_response(502)] * 3)
+    assert scheduler.request(send, "GET", url).status_code == 502
+    assert send.calls == 3
+    assert len(sleeps) == 2 and 0 <= sleeps[0] <= 1 and 0 <= sleeps[1] <= 2
+
+    # Client errors are not retried
+    send = send_responses([get_response(404)])
+    assert scheduler.request(send, "GET", url).status_code == 404
+    assert send.calls == 1
+
+
+def test_scheduler_breaker(sleeps):
+    """
+    Test that a host that keeps failing is paused for the cooldown.
+    """
+    scheduler = RequestScheduler(retries=0, breaker_threshold=2, breaker_cooldown=60)
+    send = send_responses([get_response(500)] * 2 + [get_response(200)])
+    scheduler.request(send, "GET", url)
+    scheduler.request(send, "GET", url)
+    assert not sleeps
+    scheduler.request(send, "GET", url)
+    assert len(sleeps) == 1 and 59 <= sleeps[0] <= 60
+
+    # A success closes it again
+    assert scheduler.failures["api.github.com"] == 0
+
+
+def test_scheduler_pacing(sleeps):
+    """
+    Test that requests are spaced out as the rate limit (from the mock server) runs low.
+    """
+    with MockGitHubServer(tag_count=5, rate_limit=22, window=100) as server:
+        client = GitHubSession(RequestScheduler(retries=0, reserve=10))
+        tags = f"{server.url}/repos/other/action/git/refs/tags"
+
+        # Plenty left, no waiting
+        client.get(tags)
+        assert not sleeps and client.scheduler.remaining["127.0.0.1:%s" % server.server_address[1]]
+
+        # Close to the reserve, requests are spread over the rest of the window
+        for _ in range(10):
+            client.get(tags)
+        assert sleeps and all(0 < x < 100 for x in sleeps)
+
+        # At the reserve, we wait for the reset
+        sleeps.clear()
+        client.get(tags)
+        assert 90 < sleeps[-1] <= 100
@@ -0,0 +1,83 @@
+#!/usr/bin/python
+
+# Copyright (C) 2022 Vanessa Sochat.
+
+# This Source Code Form is subject to the terms of the
+# Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+# with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+
+import pytest
+
+import action_updater.utils as utils
+from action_updater.client import get_parser
+from action_updater.main.server import MockGitHubServer, get_sha
+from action_updater.main.snapshot import Snapshot
+from action_updater.tests.helpers import init_mock_client, write_workflow
+
+
+def run_command(*argv):
+    """
+    Run an action-updater command (as from the command line).
+    """
+    args, extra = get_parser().parse_known_args(list(argv))
+    if args.command == "snapshot":
+        from action_updater.client.snapshot import main
+    elif args.command == "detect":
+        from action_updater.client.detect import main
+    else:
+        from action_updater.client.update import main
+    main(args=args, parser=None, extra=extra, subparser=None)
+
+
+def test_snapshot_offline(tmp_path):
+    """
+    Test exporting a snapshot, and then updating from it offline without any requests.
+    """
+    uses = ["actions/checkout@v1", "other/action@v1", "missing/action@v1"]
+    workflow = write_workflow(str(tmp_path), uses)
+    snapshot = os.path.join(str(tmp_path), "snapshot.json")
+    settings_file = os.path.join(str(tmp_path), "settings.yml")
+
+    with MockGitHubServer(tag_count=250, repos={"missing/action": None}) as server:
+        init_mock_client(str(tmp_path), server)
+        run_command(
+            "--settings-file", settings_file, "snapshot", "export", workflow, "-o", snapshot
+        )
+
+        # Repositories that do not exist are not in the snapshot
+        saved = Snapshot(snapshot)
+        assert saved.github_api == server.url
+        assert set(saved.repos) == {"actions/checkout", "other/action"}
+        assert len(saved.repos["other/action"]) == 260
+        requests = server.requests
+
+        # Detect finds changes (and exits non-zero) without requests
+        with pytest.raises(SystemExit):
+            run_command(
+                "--settings-file",
+                settings_file,
+                "detect",
+                workflow,
+                "--offline",
+                "--snapshot",
+                snapshot,
+            )
+        assert server.requests == requests
+
+        run_command(
+            "--settings-file",
+            settings_file,
+            "update",
+            workflow,
+            "--offline",
+            "--snapshot",
+            snapshot,
+        )
+        assert server.requests == requests
+
+    content = utils.read_file(workflow)
+    assert "actions/checkout@v10\n" in content
+    assert "other/action@%s # v10.4.4" % get_sha("other/action", "v10.4.4") in content
+    assert "missing/action@v1\n" in content
@@ -0,0 +1,28 @@
+#!/usr/bin/python
+
+# Copyright (C) 2022 Vanessa Sochat.
+
+# This Source Code Form is subject to the terms of the
+# Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+# with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import json
+
+import pytest
+
+from action_updater.utils import iter_json_array
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64, 100000])
+def test_iter_json_array(size):
+    """
+    Test that a json array is parsed the same regardless of chunk boundaries.
+    """
+    items = [
+        {"ref": "refs/tags/v%s" % i, "object": {"sha": "é%s" % i, "type": "commit"}, "n": 10**i}
+        for i in range(20)
+    ]
+    body = json.dumps(items, indent=2).encode("utf-8")
+    chunks = (body[i : i + size] for i in range(0, len(body), size))
+    assert list(iter_json_array(chunks)) == items
+    assert list(iter_json_array([b"[]"])) == []
@@ -8,11 +8,24 @@
 
 import os
 import string
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 
+from action_updater.main import get_client
 from action_updater.main.action import GitHubAction
-from action_updater.tests.helpers import get_updaters, here, init_client
+from action_updater.main.graphql import get_graphql_url
+from action_updater.main.index import TagIndex
+from action_updater.main.lock import get_lock_path
+from action_updater.main.server import MockGitHubServer, get_sha
+from action_updater.tests.helpers import (
+    detect_steps,
+    get_updaters,
+    here,
+    init_client,
+    init_mock_client,
+    write_workflow,
+)
 
 
 @pytest.mark.parametrize("updater_name", get_updaters())
@@ -59,3 +72,434 @@ def test_updaters(tmp_path, updater_name):
     action = GitHubAction(after_file)
     result = updater.detect(action)
     assert result is False
+
+
+def test_version_updater_mock(tmp_path):
+    """
+    Test the version updater (and requests) against a mock GitHub API.
+    """
+    workflow = write_workflow(str(tmp_path), ["actions/checkout@v1", "other/action@v1"])
+
+    # 250 tags is three pages, the latest release is v10.4.4
+    with MockGitHubServer(tag_count=250) as server:
+        client = init_mock_client(str(tmp_path), server, cache=True)
+        steps = detect_steps(client, workflow)
+        assert steps[0]["uses"] == "actions/checkout@v10"
+        assert steps[1]["uses"] == "other/action@%s" % get_sha("other/action", "v10.4.4")
+        # Three pages of tags for other/action, and actions/checkout only needs
+        # matching tags for v1 (which includes v10) and then v11 (none)
+        assert server.requests == 5
+
+        # A second client revalidates (304) and does not use the rate limit
+        remaining = server.remaining
+        client = init_mock_client(str(tmp_path), server, cache=True)
+        client.detect(workflow, updaters=["version"])
+        assert server.requests == 10
+        assert server.remaining == remaining
+
+
+def test_version_updater_store(tmp_path):
+    """
+    Test that versions resolved by one client are shared with another by the store.
+    """
+    workflow = write_workflow(str(tmp_path), ["actions/checkout@v1", "other/action@v1"])
+
+    with MockGitHubServer(tag_count=250) as server:
+        client = init_mock_client(str(tmp_path), server, store=True)
+        client.detect(workflow, updaters=["version"])
+        requests = server.requests
+
+        store = client.updaters["version"].version_store
+        entry = store.get(server.url.split("//")[1], "other/action")
+        assert entry["latest"] == "v10.4.4" and entry["major"] == "v10"
+        assert TagIndex.from_dict(entry["tags"]).latest == "v10.4.4"
+        assert store.get(server.url.split("//")[1], "actions/checkout")["tags"] is None
+
+        # A new client (e.g., another process) makes no requests
+        client = init_mock_client(str(tmp_path), server, store=True)
+        steps = detect_steps(client, workflow)
+        assert steps[0]["uses"] == "actions/checkout@v10"
+        assert steps[1]["uses"] == "other/action@%s" % get_sha("other/action", "v10.4.4")
+        assert server.requests == requests
+
+
+def test_version_updater_single_flight(tmp_path):
+    """
+    Test that concurrent lookups of the same repository fetch its tags once.
+    """
+    with MockGitHubServer(tag_count=250, latency=0.05) as server:
+        client = init_mock_client(str(tmp_path), server)
+        updater = client.updaters["version"]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(updater.get_update, ["other/action"] * 16))
+        assert set(results) == {"%s # v10.4.4" % get_sha("other/action", "v10.4.4")}
+
+        # Three pages of tags, fetched once
+        assert server.requests == 3
+        assert not len(updater.flights)
+
+
+def test_version_updater_annotated(tmp_path):
+    """
+    Test that annotated tags are pinned to the commit they point to.
+    """
+    workflow = write_workflow(
+        str(tmp_path), ["other/action@v1", "another/action@v1", "plain/action@v1"]
+    )
+
+    annotated = ["other/action", "another/action"]
+    with MockGitHubServer(tag_count=20, annotated=annotated) as server:
+        client = init_mock_client(str(tmp_path), server, store=True)
+        updater = client.updaters["version"]
+        updater.cache["commits"].clear()
+        steps = detect_steps(client, workflow)
+        assert steps[0]["uses"] == "other/action@%s" % get_sha("other/action", "v1.3.4")
+        assert steps[1]["uses"] == "another/action@%s" % get_sha("another/action", "v1.3.4")
+        assert steps[2]["uses"] == "plain/action@%s" % get_sha("plain/action", "v1.3.4")
+
+        # One listing per repository, and one request per annotated tag
+        assert server.requests == 5
+        assert updater.cache["commits"][get_sha("other/action", "v1.3.4", "tag")] == get_sha(
+            "other/action", "v1.3.4"
+        )
+
+        # Commits for tag objects are stored, and never requested again
+        client = init_mock_client(str(tmp_path), server, store=True)
+        client.updaters["version"].cache["commits"].clear()
+        assert detect_steps(client, workflow)[0]["uses"] == steps[0]["uses"]
+        assert server.requests == 5
+
+
+def test_version_updater_pins(tmp_path):
+    """
+    Test that steps pinned to the latest commit are left as is, and others reported.
+    """
+    latest = get_sha("other/action", "v1.3.4")
+    workflow = write_workflow(
+        str(tmp_path),
+        [
+            f"other/action@{latest} # pinned by hand",
+            "plain/action@%s" % get_sha("plain/action", "v1.2.0"),
+            "third/action@%s" % ("0" * 40),
+        ],
+    )
+
+    with MockGitHubServer(tag_count=20) as server:
+        client = init_mock_client(str(tmp_path), server)
+        updater = client.updaters["version"]
+        action = client.detect(workflow, updaters=["version"])[workflow]
+        steps = list(action.steps)
+
+        # The latest pin (and its comment) is not changed
+        assert steps[0]["uses"] == f"other/action@{latest}"
+        assert "# pinned by hand" in "".join(action.render_after())
+        assert updater.count == 2
+        assert updater.pins == {
+            f"other/action@{latest}": "latest",
+            "plain/action@%s" % get_sha("plain/action", "v1.2.0"): "outdated",
+            "third/action@%s" % ("0" * 40): "unknown",
+        }
+
+
+def test_version_updater_lock(tmp_path):
+    """
+    Test that a lockfile is written once, and workflows checked against it without requests.
+    """
+    workflows = os.path.join(str(tmp_path), ".github", "workflows")
+    os.makedirs(workflows)
+    workflow = write_workflow(workflows, ["actions/checkout@v1", "other/action@v1"])
+
+    with MockGitHubServer(tag_count=20) as server:
+        client = init_mock_client(str(tmp_path), server)
+        lock = client.write_lock(workflows)
+        assert os.path.exists(os.path.join(str(tmp_path), ".github", "actions.lock"))
+        assert lock.actions["other/action@v1"]["commit"] == get_sha("other/action", "v1.3.4")
+        assert lock.actions["actions/checkout@v1"]["commit"] is None
+        requests = server.requests
+
+        # Checking against the lockfile makes no requests
+        client = get_client(
+            settings_file=os.path.join(str(tmp_path), "settings.yml"),
+            lockfile=get_lock_path(workflows),
+        )
+        steps = detect_steps(client, workflow)
+        assert steps[0]["uses"] == "actions/checkout@v1"
+        assert steps[1]["uses"] == "other/action@%s" % get_sha("other/action", "v1.3.4")
+        assert server.requests == requests
+
+        # Locking again only resolves new references, unless we refresh
+        client = init_mock_client(str(tmp_path), server)
+        client.write_lock(workflows)
+        assert server.requests == requests
+        client.write_lock(workflows, refresh=True)
+        assert server.requests > requests
+
+
+def test_version_updater_lock_unlocked(tmp_path):
+    """
+    Test that a step not in the lockfile is left as is, unless it is already updated.
+    """
+    workflows = os.path.join(str(tmp_path), ".github", "workflows")
+    os.makedirs(workflows)
+    write_workflow(workflows, ["other/action@v5.0.0", "plain/action@v1"])
+    latest = get_sha("other/action", "v5.4.4")
+    plain = get_sha("plain/action", "v10.4.4")
+
+    with MockGitHubServer(tag_count=250) as server:
+        client = init_mock_client(str(tmp_path), server)
+        client.updaters["version"].settings["constraints"] = {"other": "major"}
+        lock = client.write_lock(workflows)
+        assert lock.actions["other/action@v5.0.0"]["commit"] == latest
+        requests = server.requests
+
+        # A step added after locking is not given the entry of another step, and
+        # constrained steps only use their own entry
+        workflow = write_workflow(
+            workflows,
+            [
+                "other/action@v3.1.0",
+                "other/action@v5.0.0",
+                f"other/action@{latest}",
+                "other/action@v5.4.4",
+                "plain/action@v10.4.4",
+            ],
+        )
+        client = get_client(
+            settings_file=os.path.join(str(tmp_path), "settings.yml"),
+            lockfile=get_lock_path(workflows),
+        )
+        client.updaters["version"].settings["constraints"] = {"other": "major"}
+        steps = detect_steps(client, workflow)
+        assert steps[0]["uses"] == "other/action@v3.1.0"
+        assert steps[1]["uses"] == f"other/action@{latest}"
+        assert steps[2]["uses"] == f"other/action@{latest}"
+        assert steps[3]["uses"] == "other/action@v5.4.4"
+        assert steps[4]["uses"] == f"plain/action@{plain}"
+        assert server.requests == requests
+
+
+def test_version_updater_releases(tmp_path):
+    """
+    Test that the latest release is used before listing tags (and tags without releases).
+    """
+    workflow = write_workflow(str(tmp_path), ["other/action@v1", "plain/action@v1"])
+
+    with MockGitHubServer(tag_count=250, releases=["other/action"]) as server:
+        client = init_mock_client(str(tmp_path), server)
+        client.updaters["version"].settings["strategy"] = "releases"
+        steps = detect_steps(client, workflow)
+        assert steps[0]["uses"] == "other/action@%s" % get_sha("other/action", "v10.4.4")
+        assert steps[1]["uses"] == "plain/action@%s" % get_sha("plain/action", "v10.4.4")
+
+        # A release and its tag ref, and then a release (not found) and three pages of tags
+        assert server.requests == 6
+
+
+def test_version_updater_release_filter(tmp_path):
+    """
+    Test that a latest release that is not a version (like nightly) falls back to listing tags.
+    """
+    workflow = write_workflow(str(tmp_path), ["other/action@v1"])
+    repos = {"other/action": ["v1.0.0", "v1.1.0", "nightly"]}
+    with MockGitHubServer(repos=repos, releases={"other/action": "nightly"}) as server:
+        client = init_mock_client(str(tmp_path), server)
+        client.updaters["version"].settings["strategy"] = "releases"
+        steps = detect_steps(client, workflow)
+        assert steps[0]["uses"] == "other/action@%s" % get_sha("other/action", "v1.1.0")
+
+        # The release, and then the tags (and not the tag ref of the release)
+        assert server.requests == 2
+
+
+def test_version_updater_constraints(tmp_path):
+    """
+    Test that constrained repositories are updated within their major (or minor) version.
+    """
+    workflow = write_workflow(
+        str(tmp_path),
+        [
+            "other/action@v3.1.0",
+            "plain/action@%s" % get_sha("plain/action", "v4.1.2"),
+            "free/action@v3.1.0",
+            "other/action@v5.2.1",
+        ],
+    )
+
+    with MockGitHubServer(tag_count=250) as server:
+        client = init_mock_client(str(tmp_path), server)
+        updater = client.updaters["version"]
+        updater.settings["constraints"] = {"other": "major", "plain/action": "minor"}
+        steps = detect_steps(client, workflow)
+        assert steps[0]["uses"] == "other/action@%s" % get_sha("other/action", "v3.4.4")
+        assert steps[1]["uses"] == "plain/action@%s" % get_sha("plain/action", "v4.1.4")
+        assert steps[2]["uses"] == "free/action@%s" % get_sha("free/action", "v10.4.4")
+        assert steps[3]["uses"] == "other/action@%s" % get_sha("other/action", "v5.4.4")
+
+        # One listing (three pages) per repository
+        assert server.requests == 9
+
+
+def test_version_updater_references(tmp_path):
+    """
+    Test that actions in subfolders share one lookup, and unresolvable uses make no requests.
+    """
+    workflow = write_workflow(
+        str(tmp_path),
+        [
+            "other/codeql-action/init@v1",
+            "other/codeql-action/analyze@v1",
+            "docker://alpine:3.8",
+            "${{ matrix.action }}",
+        ],
+    )
+
+    with MockGitHubServer(tag_count=20) as server:
+        client = init_mock_client(str(tmp_path), server)
+        steps = detect_steps(client, workflow)
+        sha = get_sha("other/codeql-action", "v1.3.4")
+        assert steps[0]["uses"] == f"other/codeql-action/init@{sha}"
+        assert steps[1]["uses"] == f"other/codeql-action/analyze@{sha}"
+        assert steps[2]["uses"] == "docker://alpine:3.8"
+        assert steps[3]["uses"] == "${{ matrix.action }}"
+        assert server.requests == 1
+
+
+def test_version_updater_graphql(tmp_path, monkeypatch):
+    """
+    Test that the GraphQL backend gets the same tags as REST, in batches (and pages).
+    """
+    monkeypatch.setenv("GITHUB_TOKEN", "token")
+    repos = ["other/action", "another/action", "missing/action"]
+    with MockGitHubServer(
+        tag_count=250, repos={"missing/action": None}, annotated=["another/action"]
+    ) as server:
+        client = init_mock_client(str(tmp_path), server)
+        rest = {repo: client.updaters["version"].get_tags_lookup(repo) for repo in repos}
+        requests = server.requests
+
+        # GitHub Enterprise serves GraphQL at /api/graphql
+        client = init_mock_client(
+            str(tmp_path),
+            server,
+            http={"backend": "graphql", "graphql_batch_size": 2},
+            enterprise=True,
+        )
+        updater = client.updaters["version"]
+        assert get_graphql_url(updater.global_settings.github_api) == server.url + "/api/graphql"
+        assert updater.get_tags_lookups(repos) == rest
+        assert rest["missing/action"] == {} and len(rest["other/action"]) == 260
+
+        # Two batches: three pages (with a cursor) for the first, and one for the missing repo
+        assert server.graphql_requests == 4
+
+        # Annotated tags are resolved to commits in one query
+        tag = get_sha("another/action", "v10.4.4", "tag")
+        commits = updater.dereference_tags({tag: "another/action"})
+        assert commits == {tag: get_sha("another/action", "v10.4.4")}
+        assert server.graphql_requests == 5
+        assert server.requests == requests + 5
+
+
+def test_version_updater_graphql_fallback(tmp_path, monkeypatch):
+    """
+    Test that repositories (and annotated tags) of a failed GraphQL query are resolved with REST.
+    """
+    monkeypatch.setenv("GITHUB_TOKEN", "token")
+    workflow = write_workflow(str(tmp_path), ["other/action@v1", "another/action@v1"])
+    with MockGitHubServer(tag_count=20, annotated=["another/action"], graphql_status=502) as server:
+        client = init_mock_client(str(tmp_path), server, http={"backend": "graphql", "retries": 0})
+        steps = detect_steps(client, workflow)
+        assert steps[0]["uses"] == "other/action@%s" % get_sha("other/action", "v1.3.4")
+        assert steps[1]["uses"] == "another/action@%s" % get_sha("another/action", "v1.3.4")
+
+        # A failed query for tags and for the tag object, and then REST for each
+        assert server.graphql_requests == 0
+        assert server.requests == 5
+
+
+def test_version_updater_snapshot_annotated(tmp_path):
+    """
+    Test that annotated tags are exported to a snapshot with their commit, and pinned offline.
+    """
+    workflow = write_workflow(str(tmp_path), ["other/action@v1", "pinned/action@v1.1.0"])
+    snapshot = os.path.join(str(tmp_path), "snapshot.json")
+    with MockGitHubServer(tag_count=20, annotated=["other/action", "pinned/action"]) as server:
+        client = init_mock_client(str(tmp_path), server)
+        exported = client.export_snapshot(workflow, snapshot)
+        latest = get_sha("other/action", "v1.3.4")
+        assert exported.repos["other/action"]["v1.3.4"] == [latest, "commit"]
+
+        # Two listings, and the latest tag within each minor version (4 per repository)
+        assert server.requests == 10
+        requests = server.requests
+
+        client = get_client(
+            settings_file=os.path.join(str(tmp_path), "settings.yml"),
+            snapshot=snapshot,
+            offline=True,
+        )
+        client.updaters["version"].settings["constraints"] = {"pinned": "minor"}
+        steps = detect_steps(client, workflow)
+        assert steps[0]["uses"] == f"other/action@{latest}"
+        assert steps[1]["uses"] == "pinned/action@%s" % get_sha("pinned/action", "v1.1.4")
+        assert server.requests == requests
+
+
+def test_version_updater_major_probes(tmp_path):
+    """
+    Test that finding major tags by prefix continues past a major without a major tag.
+    """
+    workflow = write_workflow(str(tmp_path), ["actions/setup@v3", "actions/gap@v3"])
+    repos = {
+        "actions/setup": ["v3", "v3.0.0", "v4.0.0", "v4.1.0", "v5", "v5.0.0"],
+        "actions/gap": ["v3", "v3.0.0", "v5", "v5.0.0"],
+    }
+    with MockGitHubServer(repos=repos) as server:
+        client = init_mock_client(str(tmp_path), server)
+        steps = detect_steps(client, workflow)
+        assert steps[0]["uses"] == "actions/setup@v5"
+
+        # Without any v4 tags we cannot know about v5 (without listing all tags)
+        assert steps[1]["uses"] == "actions/gap@v3"
+
+        # Probes for v3, v4, v5 and v6, and for v3 and v4
+        assert server.requests == 6
+
+
+def test_version_updater_memory_bounds(tmp_path):
+    """
+    Test that updates resolved by prepare are kept for detect, beyond the bounds for tags.
+    """
+    repos = [f"org/action{i}" for i in range(5)]
+    workflow = write_workflow(str(tmp_path), [f"{repo}@v1" for repo in repos])
+    with MockGitHubServer(tag_count=20) as server:
+        client = init_mock_client(str(tmp_path), server)
+        updater = client.updaters["version"]
+        updater.cache["tags"].max_entries = 2
+        assert updater.cache["updates"].max_entries is None
+        steps = detect_steps(client, workflow)
+        for repo, step in zip(repos, steps):
+            assert step["uses"] == "%s@%s" % (repo, get_sha(repo, "v1.3.4"))
+
+        # One listing per repository, and none again for detect
+        assert server.requests == 5
+        assert len(updater.cache["tags"]) == 2 and updater.cache["tags"].stats["evictions"]
+
+
+@pytest.mark.parametrize("links_on_304", [True, False])
+def test_version_updater_new_page(tmp_path, links_on_304):
+    """
+    Test that a tag added on a new page is found when the pages we cached are not modified.
+    """
+    workflow = write_workflow(str(tmp_path), ["other/action@v1"])
+    names = [f"v{i // 25 + 1}.{(i // 5) % 5}.{i % 5}" for i in range(200)]
+    with MockGitHubServer(repos={"other/action": names}, links_on_304=links_on_304) as server:
+        client = init_mock_client(str(tmp_path), server, cache=True)
+        steps = detect_steps(client, workflow)
+        assert steps[0]["uses"] == "other/action@%s" % get_sha("other/action", "v8.4.4")
+
+        # The new tag is listed last, on a third page (the first two are not modified)
+        server.add_tag("other/action", "v9.9.9")
+        client = init_mock_client(str(tmp_path), server, cache=True)
+        steps = detect_steps(client, workflow)
+        assert steps[0]["uses"] == "other/action@%s" % get_sha("other/action", "v9.9.9")
@@ -14,4 +14,5 @@ from .fileio import (
     write_json,
     write_yaml,
 )
+from .stream import iter_json_array
 from .terminal import confirm_action, get_installdir, run_command
@@ -0,0 +1,68 @@
+__author__ = "Vanessa Sochat"
+__copyright__ = "Copyright 2022, Vanessa Sochat"
+__license__ = "MPL 2.0"
+
+import codecs
+import json
+
+# Characters between items of a json array
+separators = " \t\n\r,"
+
+
+def iter_json_array(chunks):
+    """
+    Incrementally parse a json array from chunks of bytes, yielding each item.
+
+    Only the current (partial) item is held in memory, so a caller that keeps
+    a small part of each item has memory bounded by what it keeps.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    started = False
+
+    def parse(buffer, final=False):
+        """
+        Parse complete items from the buffer, returning them and the unparsed rest.
+        """
+        nonlocal started
+        items = []
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in separators:
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a json array.")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return items, "", True
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                break
+
+            # An item (e.g., a number) is only complete if followed by a separator
+            if not final and (end == len(buffer) or buffer[end] not in separators + "]"):
+                break
+            items.append(item)
+            pos = end
+        return items, buffer[pos:], False
+
+    for chunk in chunks:
+        buffer += text.decode(chunk)
+        items, buffer, done = parse(buffer)
+        yield from items
+        if done:
+            return
+
+    items, buffer, done = parse(buffer + text.decode(b"", final=True), final=True)
+    yield from items
+    if not done:
+        raise ValueError("Incomplete json array.")
@@ -2,7 +2,7 @@ __author__ = "Vanessa Sochat"
 __copyright__ = "Copyright 2022, Vanessa Sochat"
 __license__ = "MPL 2.0"
 
-__version__ = "0.0.16"
+__version__ = "0.0.41"
 AUTHOR = "Vanessa Sochat"
 EMAIL = "vsoch@users.noreply.github.com"
 NAME = "action-updater"
@@ -31,4 +31,7 @@ TESTS_REQUIRES = (("pytest", {"min_version": "4.6.2"}),)
 ################################################################################
 # Submodule Requirements (versions that include database)
 
-INSTALL_REQUIRES_ALL = INSTALL_REQUIRES + TESTS_REQUIRES
+# Optional, to parse very large tag sets in bulk
+INSTALL_REQUIRES_NUMPY = (("numpy", {"min_version": None}),)
+
+INSTALL_REQUIRES_ALL = INSTALL_REQUIRES + INSTALL_REQUIRES_NUMPY + TESTS_REQUIRES
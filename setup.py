@@ -58,6 +58,7 @@ if __name__ == "__main__":
 
     INSTALL_REQUIRES = get_reqs(lookup)
     TESTS_REQUIRES = get_reqs(lookup, "TESTS_REQUIRES")
+    INSTALL_REQUIRES_NUMPY = get_reqs(lookup, "INSTALL_REQUIRES_NUMPY")
     INSTALL_REQUIRES_ALL = get_reqs(lookup, "INSTALL_REQUIRES_ALL")
 
     setup(
@@ -80,6 +81,7 @@ if __name__ == "__main__":
         tests_require=TESTS_REQUIRES,
         extras_require={
             "all": [INSTALL_REQUIRES_ALL],
+            "numpy": [INSTALL_REQUIRES_NUMPY],
         },
         classifiers=[
             "Intended Audience :: Science/Research",